@@ -0,0 +1,193 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+from flask import abort, current_app, render_template, request
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from cache import cached_page
+from extensions import db
+from models.models import Artist, Show, Venue
+from queries import SHOW_PAGE_ARGS, page_filters, show_page_args, show_page_query, show_page_result
+from replicas import read_only, replica_engine
+from serializers import artist_data, show_item, venue_data
+
+
+# ----------------------------------------------------------------------------#
+# Event loop.
+# ----------------------------------------------------------------------------#
+
+# with ASYNC_VIEWS the detail pages and the shows feed are served by async views that
+# run their independent queries concurrently on sqlalchemy's asyncio engine. the
+# views run on one event loop per process, in a background thread started on first
+# use (so after a fork), and the worker thread serving the request waits for them.
+# the async engines' pools live on that loop and are shared by all worker threads.
+# requires asyncpg for postgres or aiosqlite for sqlite
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+class EventLoop(object):
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.loop = None
+    self.pid = None
+    self.engines = {}
+
+  def get(self):
+    with self.lock:
+      if self.loop is None or self.pid != os.getpid():
+        self.loop = asyncio.new_event_loop()
+        self.pid = os.getpid()
+        self.engines = {}
+        threading.Thread(target=self.loop.run_forever, name='fyyur-async',
+                         daemon=True).start()
+      return self.loop
+
+  def async_to_sync(self, func):
+    # Flask.async_to_sync replacement: run the coroutine function on the loop in a copy
+    # of the caller's context, so the app and request context are available to it
+    def run(*args, **kwargs):
+      loop = self.get()
+      context = contextvars.copy_context()
+      future = concurrent.futures.Future()
+
+      def done(task):
+        if task.cancelled():
+          future.cancel()
+        elif task.exception() is not None:
+          future.set_exception(task.exception())
+        else:
+          future.set_result(task.result())
+
+      def start():
+        task = context.run(lambda: loop.create_task(func(*args, **kwargs)))
+        task.add_done_callback(done)
+
+      loop.call_soon_threadsafe(start)
+      return future.result()
+    return run
+
+  def engine(self, sync_engine):
+    # the async engine with the same url and pool settings as a sync engine
+    with self.lock:
+      key = str(sync_engine.url)
+      if key not in self.engines:
+        self.engines[key] = create_async(sync_engine.url, current_app.config)
+      return self.engines[key]
+
+
+def create_async(url, config):
+  try:
+    from sqlalchemy.ext.asyncio import create_async_engine
+  except ImportError:
+    raise RuntimeError('ASYNC_VIEWS requires sqlalchemy 1.4 with asyncio support')
+  backend = url.get_backend_name()
+  if backend not in ASYNC_DRIVERS:
+    raise RuntimeError('ASYNC_VIEWS does not support ' + backend)
+  options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+  options.pop('connect_args', None)
+  if backend == 'postgresql' and config.get('DB_STATEMENT_TIMEOUT_MS'):
+    options['connect_args'] = {'server_settings': {
+        'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+  return create_async_engine(url.set(drivername=ASYNC_DRIVERS[backend]), **options)
+
+
+event_loop = EventLoop()
+
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+# each statement runs on its own connection so the statements of a page run
+# concurrently. the engine follows the same primary/replica routing as the session
+
+
+def current_engine():
+  return event_loop.engine(replica_engine() or db.engine)
+
+
+async def fetch_all(statement):
+  async with current_engine().connect() as connection:
+    return (await connection.execute(statement)).all()
+
+
+async def fetch_objects(statement):
+  from sqlalchemy.ext.asyncio import AsyncSession
+  async with AsyncSession(current_engine()) as session:
+    return (await session.execute(statement)).unique().scalars().all()
+
+
+async def venue_page(venue_id):
+  # the venue and its shows with their artists, side by side
+  venues, shows = await asyncio.gather(
+      fetch_objects(select(Venue).filter(Venue.id == venue_id)),
+      fetch_objects(select(Show).options(joinedload(Show.artist_shows)).filter(
+          Show.venue_id == venue_id).order_by(Show.start_time)))
+  return (venues[0] if venues else None), shows
+
+
+async def artist_page(artist_id):
+  # the artist and its shows with their venues, side by side
+  artists, shows = await asyncio.gather(
+      fetch_objects(select(Artist).filter(Artist.id == artist_id)),
+      fetch_objects(select(Show).options(joinedload(Show.venue_shows)).filter(
+          Show.artist_id == artist_id).order_by(Show.start_time)))
+  return (artists[0] if artists else None), shows
+
+
+# ----------------------------------------------------------------------------#
+# Views.
+# ----------------------------------------------------------------------------#
+
+# async versions of the views of the same endpoints in views.py
+
+
+@read_only
+@cached_page()
+async def show_venue(venue_id):
+  venue, shows = await venue_page(venue_id)
+  if venue is None:
+    abort(404)
+  data = venue_data(venue, shows)
+  return render_template('pages/show_venue.html', venue=data)
+
+
+@read_only
+@cached_page()
+async def show_artist(artist_id):
+  artist, shows = await artist_page(artist_id)
+  if artist is None:
+    abort(404)
+  data = artist_data(artist, shows)
+  return render_template('pages/show_artist.html', artist=data)
+
+
+@read_only
+@cached_page('shows', SHOW_PAGE_ARGS)
+async def shows():
+  try:
+    when, cursor, per_page, window = show_page_args(request.args, current_app.config)
+    statement = show_page_query(when, cursor, per_page, window=window)
+  except ValueError:
+    abort(400)
+  rows, next_cursor = show_page_result(await fetch_all(statement), per_page)
+  data = [show_item(row) for row in rows]
+
+  return render_template('pages/shows.html', shows=data, when=when, next_cursor=next_cursor,
+                         filters=page_filters(request.args))
+
+
+ASYNC_VIEWS = {
+    'main.show_venue': show_venue,
+    'main.show_artist': show_artist,
+    'main.shows': shows,
+}
+
+
+def use_async_views(app):
+  app.async_to_sync = event_loop.async_to_sync
+  app.view_functions.update(ASYNC_VIEWS)
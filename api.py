@@ -0,0 +1,228 @@
+import hashlib
+import json
+from datetime import date
+from functools import wraps
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from cache import cache, page_key
+from counters import show_column, upcoming_counters
+from models.models import Artist, Venue
+from queries import (artist_detail, artist_listing, booking_conflicts, calendar_args, parse_datetime,
+                     show_counts, show_page, show_page_args, venue_detail, venue_listing)
+from replicas import read_only
+from search import genre_counts, search
+from serializers import (artist_data, artist_listing_item, booking_item, search_response, show_item, venue_data,
+                         venue_listing_item)
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+# ----------------------------------------------------------------------------#
+# Helpers.
+# ----------------------------------------------------------------------------#
+
+
+def encode(value):
+  if isinstance(value, date):
+    return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def stream_json(rows, serialize):
+  # serialize a collection one row at a time as a chunked json array, so memory stays
+  # flat whatever the number of rows
+  def generate():
+    yield '['
+    separator = ''
+    for row in rows:
+      yield separator + json.dumps(serialize(row), default=encode)
+      separator = ','
+    yield ']'
+  return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def json_response(data):
+  return Response(json.dumps(data, default=encode), mimetype='application/json')
+
+
+def conditional(view):
+  # answer If-None-Match requests for unchanged data with 304. the etag is the hash of
+  # the json body, so it changes exactly when the data does, whichever process or
+  # cache backend serves the request. the view still runs, a 304 saves sending the body
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    response = view(*args, **kwargs)
+    if response.status_code == 200:
+      response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+      response.make_conditional(request)
+    return response
+  return wrapper
+
+
+def versioned(view):
+  # streamed collections send their headers before the body exists, so their etag is
+  # the 'data' version every write bumps instead, checked before running the view.
+  # per-process and null backends don't see other processes' bumps and would answer
+  # 304 for data changed since, so only a shared backend gets etags
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    if not cache.shared:
+      return view(*args, **kwargs)
+    key = '%s|%s' % (request.full_path, cache.version('data'))
+    etag = hashlib.sha1(key.encode()).hexdigest()
+    if etag in request.if_none_match:
+      response = Response(status=304)
+    else:
+      response = view(*args, **kwargs)
+    response.set_etag(etag)
+    return response
+  return wrapper
+
+
+def availability(model, id):
+  # whether a venue or artist is free from start until end, with the shows in the way.
+  # answered from the primary and never cached, it is asked right before booking
+  try:
+    start = parse_datetime(request.args['start'])
+    end = parse_datetime(request.args['end'])
+  except (KeyError, ValueError):
+    abort(400)
+  if end <= start:
+    abort(400)
+  if model.query.get(id) is None:
+    abort(404)
+  conflicts = booking_conflicts(show_column(model), id, start, end)
+  return json_response({'start': start, 'end': end, 'available': not conflicts,
+                        'conflicts': [booking_item(row) for row in conflicts]})
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+  return jsonify({'error': error.code, 'message': error.description}), error.code
+
+
+# ----------------------------------------------------------------------------#
+# Venues.
+# ----------------------------------------------------------------------------#
+
+
+@api.route('/venues')
+@read_only
+@versioned
+def venues():
+  return stream_json(venue_listing().yield_per(1000), venue_listing_item)
+
+
+@api.route('/venues/<int:venue_id>')
+@read_only
+@conditional
+def venue(venue_id):
+  venue = venue_detail(venue_id)
+  if venue is None:
+    abort(404)
+  return json_response(venue_data(venue))
+
+
+@api.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+  return availability(Venue, venue_id)
+
+
+@api.route('/venues/search')
+@read_only
+@conditional
+def search_venues():
+  # name search, narrowed to one genre with genre=, with the matches per genre
+  term = request.args.get('q', '')
+  results = search(Venue, term, current_app.config['SEARCH_RESULTS_LIMIT'],
+                   request.args.get('genre') or None)
+  counts = upcoming_counters(Venue, [result.id for result in results])
+  return json_response(search_response(results, counts, genre_counts(Venue, term)))
+
+
+# ----------------------------------------------------------------------------#
+# Artists.
+# ----------------------------------------------------------------------------#
+
+
+@api.route('/artists')
+@read_only
+@versioned
+def artists():
+  return stream_json(artist_listing().yield_per(1000), artist_listing_item)
+
+
+@api.route('/artists/<int:artist_id>')
+@read_only
+@conditional
+def artist(artist_id):
+  artist = artist_detail(artist_id)
+  if artist is None:
+    abort(404)
+  return json_response(artist_data(artist))
+
+
+@api.route('/artists/<int:artist_id>/availability')
+def artist_availability(artist_id):
+  return availability(Artist, artist_id)
+
+
+@api.route('/artists/search')
+@read_only
+@conditional
+def search_artists():
+  # name search, narrowed to one genre with genre=, with the matches per genre
+  term = request.args.get('q', '')
+  results = search(Artist, term, current_app.config['SEARCH_RESULTS_LIMIT'],
+                   request.args.get('genre') or None)
+  counts = upcoming_counters(Artist, [result.id for result in results])
+  return json_response(search_response(results, counts, genre_counts(Artist, term)))
+
+
+# ----------------------------------------------------------------------------#
+# Shows.
+# ----------------------------------------------------------------------------#
+
+
+@api.route('/shows')
+@read_only
+@conditional
+def shows():
+  # same (start_time, id) cursor pages and filters as the html feed
+  try:
+    when, cursor, per_page, window = show_page_args(request.args, current_app.config)
+    rows, next_cursor = show_page(when, cursor, per_page, window=window)
+  except ValueError:
+    abort(400)
+  return json_response({'data': [show_item(row) for row in rows],
+                        'next_cursor': next_cursor})
+
+
+def calendar_item(row):
+  obj = dict()
+  obj['period'] = row.period
+  if 'venue_id' in row._fields:
+    obj['venue_id'] = row.venue_id
+    obj['venue_name'] = row.venue_name
+  obj['shows'] = row.shows
+  return obj
+
+
+@api.route('/calendar')
+@read_only
+@conditional
+def calendar():
+  # show counts per day or week of a start/end window, optionally per venue and
+  # filtered by city, state and genre. the counts are cached per window until the
+  # next write bumps the 'shows' version
+  try:
+    per, by, window = calendar_args(request.args, current_app.config)
+  except ValueError:
+    abort(400)
+  key = page_key('/calendar|%s|%s|%s' % (per, by, '|'.join(
+      str(window[name]) for name in sorted(window))), 'shows')
+  data = cache.get(key)
+  if data is None:
+    data = [calendar_item(row) for row in show_counts(per, by, window)]
+    cache.set(key, data)
+  return json_response({'per': per, 'data': data})
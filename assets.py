@@ -0,0 +1,225 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.utils import safe_join
+
+
+# ----------------------------------------------------------------------------#
+# Bundles.
+# ----------------------------------------------------------------------------#
+
+# `flask fyyur build-assets` writes the bundles below, minified, and a copy of every
+# other file in static/ to static/build, with their content hash in the file names, and
+# records them in static/build/manifest.json. templates resolve names through the
+# asset() and assets() helpers. without a build, in development, they resolve to the
+# source files, so edits show up without building
+
+BUNDLES = {
+    'css/app.css': [
+        'css/bootstrap.min.css', 'css/font-awesome.css', 'css/layout.main.css',
+        'css/main.css', 'css/main.responsive.css', 'css/main.quickfix.css'],
+    'js/app.js': [
+        'js/libs/jquery-1.11.1.min.js', 'js/libs/bootstrap-3.1.1.min.js',
+        'js/libs/moment.min.js', 'js/plugins.js', 'js/script.js'],
+}
+
+BUILD = 'build'
+MANIFEST = 'manifest.json'
+
+# built files with these extensions get .gz and .br (with the brotli package
+# installed) variants, when those are smaller
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.eot', '.ttf', '.otf')
+
+CSS_TOKENS = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/|\s+', re.S)
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(source):
+  # comments (but /*! license comments) and the whitespace that doesn't separate
+  # anything are removed, strings are kept as they are. comments go first, so the
+  # whitespace around them is seen as one run
+  def comment(match):
+    text = match.group(0)
+    return '' if text.startswith('/*') and not text.startswith('/*!') else text
+
+  def space(match):
+    text = match.group(0)
+    if not text.isspace():
+      return text
+    before = css[match.start() - 1:match.start()]
+    after = css[match.end():match.end() + 1]
+    if not before or not after or before in '{};,:>(' or after in '{};,>)':
+      return ''
+    return ' '
+  css = CSS_TOKENS.sub(comment, source)
+  return CSS_TOKENS.sub(space, css)
+
+
+def minify_js(source):
+  # only indentation, blank lines and whole line // comments are removed, anything
+  # finer needs a javascript parser. the libraries come minified already
+  lines = [line.strip() for line in source.splitlines()]
+  return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def rewrite_urls(css, source, target, manifest):
+  # url()s are relative to the source file, they are pointed at the built copies,
+  # relative to the bundle
+  def replace(match):
+    quote, url = match.groups()
+    if re.match(r'[a-z]+:|/|#', url):
+      return match.group(0)
+    path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+    name = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+    built = manifest.get(name, name)
+    return 'url(%s%s%s%s)' % (
+        quote, posixpath.relpath(built, posixpath.dirname(target)), suffix, quote)
+  return CSS_URL.sub(replace, css)
+
+
+def bundle(static_folder, name, manifest):
+  target = posixpath.join(BUILD, name)
+  parts = []
+  for source in BUNDLES[name]:
+    with open(os.path.join(static_folder, source), encoding='utf-8') as file:
+      text = file.read()
+    if name.endswith('.css'):
+      text = rewrite_urls(text, source, target, manifest)
+      parts.append(text if '.min.' in source else minify_css(text))
+    else:
+      parts.append(text if '.min.' in source else minify_js(text))
+  # scripts are separated by a semicolon, one may not end its last statement
+  separator = '\n' if name.endswith('.css') else '\n;\n'
+  return separator.join(parts).encode('utf-8')
+
+
+# ----------------------------------------------------------------------------#
+# Build.
+# ----------------------------------------------------------------------------#
+
+# earlier builds are left in place, pages rendered before a deploy can still load
+# the files they link to
+
+
+def source_files(static_folder):
+  build_folder = os.path.join(static_folder, BUILD)
+  for root, folders, files in os.walk(static_folder):
+    folders[:] = [folder for folder in folders if not folder.startswith('.')
+                  and os.path.join(root, folder) != build_folder]
+    for file in files:
+      if not file.startswith('.'):
+        yield os.path.relpath(os.path.join(root, file), static_folder).replace(os.sep, '/')
+
+
+def precompress(path, content):
+  variants = {'.gz': gzip.compress(content, 9, mtime=0)}
+  try:
+    import brotli
+    variants['.br'] = brotli.compress(content)
+  except ImportError:
+    pass
+  for suffix, data in variants.items():
+    if len(data) < len(content):
+      with open(path + suffix, 'wb') as file:
+        file.write(data)
+
+
+def write_built(static_folder, name, content):
+  # the fingerprinted copy of name, returns its name
+  root, extension = posixpath.splitext(name)
+  digest = hashlib.sha256(content).hexdigest()[:12]
+  built = posixpath.join(BUILD, '%s.%s%s' % (root, digest, extension))
+  path = os.path.join(static_folder, *built.split('/'))
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'wb') as file:
+    file.write(content)
+  if extension in COMPRESSIBLE:
+    precompress(path, content)
+  return built
+
+
+def build(static_folder):
+  # returns the manifest, {name: built name} relative to static_folder. the files are
+  # copied before the bundles, whose url()s point at the copies
+  bundled = set(source for sources in BUNDLES.values() for source in sources)
+  manifest = dict()
+  for name in sorted(source_files(static_folder)):
+    if name not in bundled:
+      with open(os.path.join(static_folder, name), 'rb') as file:
+        manifest[name] = write_built(static_folder, name, file.read())
+  for name in sorted(BUNDLES):
+    manifest[name] = write_built(static_folder, name, bundle(static_folder, name, manifest))
+  with open(os.path.join(static_folder, BUILD, MANIFEST), 'w') as file:
+    json.dump(manifest, file, indent=2, sort_keys=True)
+    file.write('\n')
+  return manifest
+
+
+def load_manifest(static_folder):
+  try:
+    with open(os.path.join(static_folder, BUILD, MANIFEST)) as file:
+      return json.load(file)
+  except FileNotFoundError:
+    return {}
+
+
+# ----------------------------------------------------------------------------#
+# Extension.
+# ----------------------------------------------------------------------------#
+
+
+class Assets(object):
+  # the manifest is read once, when the app is created. built files are served with
+  # Cache-Control: immutable for ASSETS_MAX_AGE seconds, their names change with
+  # their content
+
+  def __init__(self, app=None):
+    self.manifest = {}
+    self.max_age = 0
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.manifest = load_manifest(app.static_folder)
+    self.max_age = app.config.get('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    app.add_url_rule(app.static_url_path + '/' + BUILD + '/<path:filename>',
+                     'assets', self.send_built)
+    app.add_template_global(self.url, 'asset')
+    app.add_template_global(self.urls, 'assets')
+    app.extensions['assets'] = self
+
+  def url(self, name):
+    return url_for('static', filename=self.manifest.get(name, name))
+
+  def urls(self, name):
+    # a bundle's built file, or its sources when it isn't built
+    if name in self.manifest:
+      return [self.url(name)]
+    return [url_for('static', filename=source) for source in BUNDLES.get(name, [name])]
+
+  def send_built(self, filename):
+    # the brotli or gzip variant goes to the clients that accept it
+    folder = os.path.join(current_app.static_folder, BUILD)
+    path, encoding = filename, None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+      variant = safe_join(folder, filename + suffix)
+      if candidate in request.accept_encodings and variant and os.path.isfile(variant):
+        path, encoding = filename + suffix, candidate
+        break
+    response = send_from_directory(
+        folder, path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        max_age=self.max_age)
+    if encoding:
+      response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+assets = Assets()
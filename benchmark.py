@@ -0,0 +1,419 @@
+import collections
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, func
+import babel.dates
+import dateutil.parser
+import aio
+import dates
+import views
+from cache import NullCache, cache
+from extensions import db
+from models.models import Artist, Show, Venue
+from profiling import percentile
+
+
+# ----------------------------------------------------------------------------#
+# Routes.
+# ----------------------------------------------------------------------------#
+
+# every route of the app is driven through the test client: GET routes as they are,
+# with the busiest venue and artist filling in the ids, plus the search forms.
+# routes that write only run with writes=True since every request adds or changes
+# rows, and the deletes never run since they would remove the sample rows
+
+SEARCH_TERM = 'blue'
+VENUE_FORM = {
+    'name': 'Benchmark Hall', 'city': 'San Francisco', 'state': 'CA',
+    'address': '1 Market St', 'phone': '415-000-0000', 'genres': ['Jazz', 'Folk'],
+    'facebook_link': 'https://www.facebook.com/benchmark', 'website_link': '',
+    'image_link': '', 'seeking_description': ''}
+ARTIST_FORM = {
+    'name': 'The Benchmarks', 'city': 'San Francisco', 'state': 'CA',
+    'phone': '415-000-0000', 'genres': ['Jazz', 'Folk'],
+    'facebook_link': 'https://www.facebook.com/benchmarks', 'website_link': '',
+    'image_link': '', 'seeking_description': ''}
+# the calendar and availability windows are the coming year
+YEAR_AHEAD = 'start=%s&end=%s' % (date.today(), date.today() + timedelta(days=365))
+# GET routes that are also benchmarked with these query strings
+VARIANTS = {
+    'main.shows': ['when=upcoming', 'when=past'],
+    'api.shows': ['when=upcoming', 'when=past'],
+    'api.calendar': [YEAR_AHEAD + '&per=day&by=venue'],
+}
+QUERY_STRINGS = {
+    'api.search_venues': 'q=' + SEARCH_TERM,
+    'api.search_artists': 'q=' + SEARCH_TERM,
+    'api.calendar': YEAR_AHEAD + '&per=week',
+    'api.venue_availability': YEAR_AHEAD,
+    'api.artist_availability': YEAR_AHEAD,
+}
+SEARCH_ENDPOINTS = {'main.search_venues', 'main.search_artists'}
+
+
+def busiest(column):
+  return db.session.query(column).group_by(column).order_by(
+      func.count().desc(), column).limit(1).scalar()
+
+
+def show_form(venue_id, artist_id):
+  # each call books the next free hour, a year ahead of the generated shows, so
+  # repeated show writes aren't rejected as overlapping
+  slots = itertools.count()
+  start = (datetime.utcnow() + timedelta(days=400)).replace(minute=0, second=0, microsecond=0)
+
+  def form():
+    start_time = start + timedelta(hours=next(slots))
+    return {'venue_id': str(venue_id), 'artist_id': str(artist_id),
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'end_time': (start_time + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')}
+  return form
+
+
+def write_forms(venue_id, artist_id):
+  # forms, or functions returning a new form per request
+  return {
+      'main.create_venue_submission': VENUE_FORM,
+      'main.edit_venue_submission': VENUE_FORM,
+      'main.create_artist_submission': ARTIST_FORM,
+      'main.edit_artist_submission': ARTIST_FORM,
+      'main.create_show_submission': show_form(venue_id, artist_id),
+  }
+
+
+def benchmark_routes(app, writes=False):
+  # returns ([(name, method, url, form)], [skipped route names])
+  venue_id = busiest(Show.venue_id) or db.session.query(func.min(Venue.id)).scalar()
+  artist_id = busiest(Show.artist_id) or db.session.query(func.min(Artist.id)).scalar()
+  ids = {'venue_id': venue_id, 'artist_id': artist_id}
+  forms = write_forms(venue_id, artist_id)
+  routes = []
+  skipped = []
+  for rule in sorted(app.url_map.iter_rules(), key=lambda rule: (rule.rule, rule.endpoint)):
+    # static files and debug pages aren't benchmarked, neither is any rule with an
+    # argument other than a venue or artist id to fill in
+    if (rule.endpoint == 'static' or rule.rule.startswith('/_')
+        or not rule.arguments <= set(ids)):
+      continue
+    url = rule.rule
+    for name in rule.arguments:
+      url = url.replace('<int:%s>' % name, str(ids[name]))
+    for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+      name = '%s %s' % (method, rule.rule)
+      if method == 'GET':
+        query = QUERY_STRINGS.get(rule.endpoint)
+        routes.append((name, method, url + ('?' + query if query else ''), None))
+        for query in VARIANTS.get(rule.endpoint, []):
+          routes.append(('%s?%s' % (name, query), method, url + '?' + query, None))
+      elif method == 'POST' and rule.endpoint in SEARCH_ENDPOINTS:
+        routes.append((name, method, url, {'search_term': SEARCH_TERM}))
+      elif writes and method == 'POST' and rule.endpoint in forms:
+        routes.append((name, method, url, forms[rule.endpoint]))
+      else:
+        skipped.append(name)
+  return routes, skipped
+
+
+# ----------------------------------------------------------------------------#
+# Measurements.
+# ----------------------------------------------------------------------------#
+
+
+def measure(client, engine, method, url, form, iterations):
+  # latencies are timed without tracemalloc, which slows allocation heavy code down.
+  # a separate traced request records the peak memory and the number of queries
+  def request():
+    response = client.open(url, method=method, data=form() if callable(form) else form)
+    response.get_data()
+    if response.status_code >= 400:
+      raise RuntimeError('%s %s returned %s' % (method, url, response.status_code))
+
+  request()
+  latencies = []
+  for _ in range(iterations):
+    start = time.perf_counter()
+    request()
+    latencies.append((time.perf_counter() - start) * 1000)
+
+  queries = []
+
+  def count(conn, cursor, statement, parameters, context, executemany):
+    queries.append(statement)
+
+  event.listen(engine, 'before_cursor_execute', count)
+  tracemalloc.start()
+  try:
+    request()
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+    event.remove(engine, 'before_cursor_execute', count)
+
+  return {
+      'p50_ms': round(percentile(latencies, 0.50), 3),
+      'p95_ms': round(percentile(latencies, 0.95), 3),
+      'p99_ms': round(percentile(latencies, 0.99), 3),
+      'queries': len(queries),
+      'peak_kb': round(peak / 1024.0, 1),
+  }
+
+
+def run(app, iterations=50, cached=False, writes=False):
+  # the page cache is switched off unless cached=True, so the numbers measure the
+  # database and rendering work rather than cache lookups
+  routes, skipped = benchmark_routes(app, writes)
+  backend = cache.backend
+  csrf = app.config.get('WTF_CSRF_ENABLED', True)
+  if not cached:
+    cache.backend = NullCache()
+  app.config['WTF_CSRF_ENABLED'] = False
+  try:
+    client = app.test_client()
+    results = dict()
+    for name, method, url, form in routes:
+      results[name] = measure(client, db.engine, method, url, form, iterations)
+  finally:
+    cache.backend = backend
+    app.config['WTF_CSRF_ENABLED'] = csrf
+
+  meta = dict()
+  meta['created'] = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+  meta['dialect'] = db.engine.dialect.name
+  meta['iterations'] = iterations
+  meta['cached'] = cached
+  meta['venues'] = db.session.query(func.count(Venue.id)).scalar()
+  meta['artists'] = db.session.query(func.count(Artist.id)).scalar()
+  meta['shows'] = db.session.query(func.count(Show.id)).scalar()
+  meta['skipped'] = skipped
+  return {'meta': meta, 'routes': results}
+
+
+# ----------------------------------------------------------------------------#
+# Sync and async views under load.
+# ----------------------------------------------------------------------------#
+
+# the views that have async versions, loaded by as many threads as the server would run
+# worker threads. both modes run against the same database with the page cache off
+
+SYNC_VIEWS = {
+    'main.show_venue': views.show_venue,
+    'main.show_artist': views.show_artist,
+    'main.shows': views.shows,
+}
+
+
+def load_urls(count=20):
+  # detail pages of the venues and artists with the most shows, and the shows feed
+  urls = []
+  for column, path in ((Show.venue_id, '/venues/%s'), (Show.artist_id, '/artists/%s')):
+    urls.extend(path % id for id, in db.session.query(column).group_by(column).order_by(
+        func.count().desc(), column).limit(count))
+  return urls + ['/shows', '/shows?when=upcoming', '/shows?when=past']
+
+
+def load(app, urls, threads, seconds):
+  # every thread requests random urls from urls until the time is up
+  latencies = []
+  errors = []
+  lock = threading.Lock()
+  deadline = time.perf_counter() + seconds
+
+  def worker(seed):
+    client = app.test_client()
+    rng = random.Random(seed)
+    timings = []
+    failures = 0
+    while time.perf_counter() < deadline:
+      start = time.perf_counter()
+      response = client.get(rng.choice(urls))
+      response.get_data()
+      timings.append((time.perf_counter() - start) * 1000)
+      failures += response.status_code >= 400
+    with lock:
+      latencies.extend(timings)
+      errors.append(failures)
+
+  start = time.perf_counter()
+  workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+  for thread in workers:
+    thread.start()
+  for thread in workers:
+    thread.join()
+  elapsed = time.perf_counter() - start
+  return {
+      'requests': len(latencies),
+      'errors': sum(errors),
+      'rps': round(len(latencies) / elapsed, 1),
+      'p50_ms': round(percentile(latencies, 0.50), 3) if latencies else None,
+      'p99_ms': round(percentile(latencies, 0.99), 3) if latencies else None,
+  }
+
+
+def compare_async(app, threads=8, seconds=10):
+  # returns {'sync': results, 'async': results}
+  urls = load_urls()
+  view_functions = dict(app.view_functions)
+  async_to_sync = app.__dict__.get('async_to_sync')
+  backend = cache.backend
+  cache.backend = NullCache()
+  results = dict()
+  try:
+    app.view_functions.update(SYNC_VIEWS)
+    results['sync'] = load(app, urls, threads, seconds)
+    aio.use_async_views(app)
+    results['async'] = load(app, urls, threads, seconds)
+  finally:
+    cache.backend = backend
+    app.view_functions.clear()
+    app.view_functions.update(view_functions)
+    if async_to_sync is None:
+      app.__dict__.pop('async_to_sync', None)
+    else:
+      app.async_to_sync = async_to_sync
+  return results
+
+
+# ----------------------------------------------------------------------------#
+# Date formatting.
+# ----------------------------------------------------------------------------#
+
+
+def legacy_format_datetime(value):
+  # the show row formatting before dates.py: the start time went to the template as a
+  # string and the filter parsed it back and formatted it with babel
+  date = dateutil.parser.parse(value.strftime('%Y-%m-%d %H:%M:%S'))
+  return babel.dates.format_datetime(date, dates.FORMATS['full'], locale='en')
+
+
+def date_formatting(rows=500, repeat=20):
+  # microseconds per row to format a page of show start times: the legacy path, the
+  # datetime filter with its memo cleared before every page, and with it warm
+  rng = random.Random(0)
+  start = datetime(2020, 1, 1, 19)
+  values = [start + timedelta(days=rng.randint(0, 365), hours=rng.randint(0, 4))
+            for _ in range(rows)]
+
+  def timed(format, clear=False):
+    best = None
+    for _ in range(repeat):
+      if clear:
+        dates.format_value.cache_clear()
+      begin = time.perf_counter()
+      for value in values:
+        format(value)
+      elapsed = time.perf_counter() - begin
+      best = elapsed if best is None else min(best, elapsed)
+    return round(best / rows * 1e6, 2)
+
+  assert all(legacy_format_datetime(value) == dates.format_datetime(value, 'full')
+             for value in values)
+  results = dict()
+  results['legacy_us'] = timed(legacy_format_datetime)
+  results['cold_us'] = timed(lambda value: dates.format_datetime(value, 'full'), clear=True)
+  results['warm_us'] = timed(lambda value: dates.format_datetime(value, 'full'))
+  return results
+
+
+# ----------------------------------------------------------------------------#
+# Startup.
+# ----------------------------------------------------------------------------#
+
+# what each server worker pays before its first request: importing the app and
+# building it the way wsgi.py does. every run is a fresh interpreter under
+# python -X importtime, so nothing is imported already
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STARTUP_CODE = (
+    'import time; start = time.perf_counter(); from app import create_app; '
+    'create_app(cli=False); print((time.perf_counter() - start) * 1000)')
+
+
+def importtime_modules(report):
+  # (module, self ms, cumulative ms) from the lines of an -X importtime report:
+  # "import time: <self us> | <cumulative us> | <indented module>"
+  modules = []
+  for line in report.splitlines():
+    if not line.startswith('import time:') or '[us]' in line:
+      continue
+    self_us, cumulative_us, name = line[len('import time:'):].split('|')
+    modules.append((name.strip(), int(self_us) / 1000.0, int(cumulative_us) / 1000.0))
+  return modules
+
+
+def package_times(modules):
+  # self time summed per top level package, slowest first
+  packages = collections.Counter()
+  for name, self_ms, _ in modules:
+    packages[name.split('.')[0]] += self_ms
+  return packages.most_common()
+
+
+def startup(runs=5):
+  # median wall time of create_app in fresh interpreters, and the import report of
+  # the last run
+  times = []
+  for _ in range(runs):
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE], cwd=ROOT,
+        capture_output=True, text=True)
+    if process.returncode:
+      raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    times.append(float(process.stdout.strip().splitlines()[-1]))
+  modules = importtime_modules(process.stderr)
+  report = dict()
+  report['runs'] = runs
+  report['median_ms'] = statistics.median(times)
+  report['imports_ms'] = sum(self_ms for _, self_ms, _ in modules)
+  report['modules'] = len(modules)
+  report['packages'] = package_times(modules)
+  report['importtime'] = process.stderr
+  return report
+
+
+# ----------------------------------------------------------------------------#
+# Baselines.
+# ----------------------------------------------------------------------------#
+
+
+def load_baseline(path):
+  try:
+    with open(path) as file:
+      return json.load(file)
+  except FileNotFoundError:
+    return None
+
+
+def save_baseline(path, report):
+  with open(path, 'w') as file:
+    json.dump(report, file, indent=2, sort_keys=True)
+    file.write('\n')
+
+
+def regressions(report, baseline, tolerance=0.2, slack_ms=1.0):
+  # a route regresses when it runs more queries than the baseline, or when its p95
+  # latency or peak memory grew by more than tolerance. slack_ms absorbs timer noise on
+  # routes that only take a millisecond or two
+  found = []
+  for name, current in sorted(report['routes'].items()):
+    previous = baseline['routes'].get(name)
+    if previous is None:
+      continue
+    if current['queries'] > previous['queries']:
+      found.append('%s: %d queries, baseline %d' % (
+          name, current['queries'], previous['queries']))
+    if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance) + slack_ms:
+      found.append('%s: p95 %.1f ms, baseline %.1f ms' % (
+          name, current['p95_ms'], previous['p95_ms']))
+    if current['peak_kb'] > previous['peak_kb'] * (1 + tolerance):
+      found.append('%s: peak memory %.0f KiB, baseline %.0f KiB' % (
+          name, current['peak_kb'], previous['peak_kb']))
+  return found
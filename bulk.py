@@ -0,0 +1,225 @@
+import csv
+import json
+from datetime import datetime
+from werkzeug.datastructures import MultiDict
+from counters import refresh_counters
+from forms import ArtistForm, ShowForm, VenueForm
+from extensions import db
+from models.models import Artist, Show, Venue, SHOW_DURATION
+from queries import batch_bookings
+from writes import COLUMNS
+
+
+# ----------------------------------------------------------------------------#
+# Import / export.
+# ----------------------------------------------------------------------------#
+
+# imports and exports stream through generators one row or one batch at a time, so
+# memory stays flat whatever the size of the file or table. rows are validated with
+# the same forms as the create pages and inserted with one executemany per batch.
+# ids are assigned by the database, shows reference existing venue and artist ids and
+# don't overlap another show of their venue or artist
+
+FORMS = {'venues': VenueForm, 'artists': ArtistForm, 'shows': ShowForm}
+MODELS = {'venues': Venue, 'artists': Artist, 'shows': Show}
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def read_rows(file, format):
+  # yield (line number, row dict) from a csv file with a header or from ndjson
+  if format == 'csv':
+    for line, row in enumerate(csv.DictReader(file), start=2):
+      yield line, row
+  else:
+    for line, text in enumerate(file, start=1):
+      if text.strip():
+        try:
+          yield line, json.loads(text)
+        except ValueError as e:
+          yield line, {'_error': str(e)}
+
+
+def form_data(row):
+  # csv lists are ';' separated, json booleans become checkbox values
+  data = MultiDict()
+  for key, value in row.items():
+    if isinstance(value, list):
+      values = value
+    elif isinstance(value, str) and key == 'genres':
+      values = [genre.strip() for genre in value.split(';') if genre.strip()]
+    elif isinstance(value, bool):
+      values = ['y'] if value else []
+    elif value is None:
+      values = []
+    else:
+      values = [str(value)]
+    for item in values:
+      data.add(key, item)
+  return data
+
+
+def validate(rows, kind):
+  # yield (line, values, None) for valid rows and (line, row, errors) for rejects.
+  # needs a request context for the flask-wtf forms
+  form_class = FORMS[kind]
+  for line, row in rows:
+    if '_error' in row:
+      yield line, row, {'row': [row['_error']]}
+      continue
+    form = form_class(formdata=form_data(row), meta={'csrf': False})
+    errors = None if form.validate() else form.errors
+    if kind == 'shows' and not errors:
+      errors = show_id_errors(form.data)
+    if errors:
+      yield line, row, errors
+    else:
+      values = dict()
+      for name, value in form.data.items():
+        values[COLUMNS.get(name, name)] = value
+      if kind == 'shows':
+        values['artist_id'] = int(values['artist_id'])
+        values['venue_id'] = int(values['venue_id'])
+        if values['end_time'] is None:
+          values['end_time'] = values['start_time'] + SHOW_DURATION
+        if values['end_time'] <= values['start_time']:
+          yield line, row, {'end_time': ['Must be after start_time.']}
+          continue
+      yield line, values, None
+
+
+def show_id_errors(data):
+  errors = dict()
+  for name in ('artist_id', 'venue_id'):
+    try:
+      int(data[name])
+    except (TypeError, ValueError):
+      errors[name] = ['Not a valid id.']
+  return errors
+
+
+def missing_references(batch):
+  # shows whose venue or artist does not exist, found with one query per table
+  venue_ids = {values['venue_id'] for line, values in batch}
+  artist_ids = {values['artist_id'] for line, values in batch}
+  venue_ids -= {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+  artist_ids -= {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+  return venue_ids, artist_ids
+
+
+def stored_bookings(batch):
+  # {(column, id): [(start, end)]} of the stored shows that could overlap a show of
+  # the batch, loaded with one query over the batch's venues, artists and time span
+  bookings = dict()
+  if batch:
+    rows = batch_bookings(
+        {values['venue_id'] for line, values in batch},
+        {values['artist_id'] for line, values in batch},
+        min(values['start_time'] for line, values in batch),
+        max(values['end_time'] for line, values in batch))
+    for row in rows:
+      add_booking(bookings, row._mapping)
+  return bookings
+
+
+def add_booking(bookings, values):
+  for column in ('venue_id', 'artist_id'):
+    bookings.setdefault((column, values[column]), []).append(
+        (values['start_time'], values['end_time']))
+
+
+def booked(values, bookings):
+  # whether the show overlaps a stored show or one earlier in the batch of its venue
+  # or artist
+  start, end = values['start_time'], values['end_time']
+  return any(other_start < end and other_end > start
+             for column in ('venue_id', 'artist_id')
+             for other_start, other_end in bookings.get((column, values[column]), ()))
+
+
+def import_rows(kind, file, format, rejects, batch_size=1000):
+  # insert valid rows in batches of batch_size, one transaction per batch, and write
+  # rejected rows with their errors to rejects as ndjson. returns (imported, rejected)
+  table = MODELS[kind].__table__
+  imported = rejected = 0
+
+  def reject(line, row, errors):
+    rejects.write(json.dumps({'line': line, 'row': row, 'errors': errors},
+                             default=str) + '\n')
+
+  valid = []
+  for line, row, errors in validate(read_rows(file, format), kind):
+    if errors:
+      reject(line, row, errors)
+      rejected += 1
+      continue
+    valid.append((line, row))
+    if len(valid) < batch_size:
+      continue
+    count, failed = insert_batch(kind, table, valid, reject)
+    imported += count
+    rejected += failed
+    valid = []
+  if valid:
+    count, failed = insert_batch(kind, table, valid, reject)
+    imported += count
+    rejected += failed
+  return imported, rejected
+
+
+def insert_batch(kind, table, batch, reject):
+  failed = 0
+  if kind == 'shows':
+    venue_ids, artist_ids = missing_references(batch)
+    bookings = stored_bookings(batch)
+    kept = []
+    for line, values in batch:
+      if values['venue_id'] in venue_ids or values['artist_id'] in artist_ids:
+        reject(line, values, {'row': ['Unknown venue_id or artist_id.']})
+        failed += 1
+      elif booked(values, bookings):
+        reject(line, values, {'row': ['The venue or the artist has another show at that time.']})
+        failed += 1
+      else:
+        kept.append((line, values))
+        add_booking(bookings, values)
+    batch = kept
+  if batch:
+    db.session.execute(table.insert(), [values for line, values in batch])
+    if kind == 'shows':
+      refresh_counters(Venue, {values['venue_id'] for line, values in batch})
+      refresh_counters(Artist, {values['artist_id'] for line, values in batch})
+    db.session.commit()
+  return len(batch), failed
+
+
+def export_rows(kind, file, format, batch_size=1000):
+  # stream a table through a server-side cursor, batch_size rows at a time
+  model = MODELS[kind]
+  columns = [column.name for column in model.__table__.columns]
+  query = db.session.query(*model.__table__.columns).order_by(model.id).execution_options(
+      stream_results=True).yield_per(batch_size)
+  if format == 'csv':
+    writer = csv.writer(file)
+    writer.writerow(columns)
+  count = 0
+  for row in query:
+    values = [export_value(value, format) for value in row]
+    if format == 'csv':
+      writer.writerow(values)
+    else:
+      file.write(json.dumps(dict(zip(columns, values))) + '\n')
+    count += 1
+  return count
+
+
+def export_value(value, format):
+  # written so the import reads them back: form datetimes, and in csv ';' separated
+  # lists and checkbox booleans
+  if isinstance(value, datetime):
+    return value.strftime(DATETIME_FORMAT)
+  if format == 'csv':
+    if isinstance(value, list):
+      return ';'.join(value)
+    if isinstance(value, bool):
+      return 'y' if value else ''
+  return value
@@ -0,0 +1,330 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, make_response, request, session
+from extensions import db
+from models.models import Show, Venue
+
+
+# ----------------------------------------------------------------------------#
+# Backends.
+# ----------------------------------------------------------------------------#
+
+
+class NullCache(object):
+  # caching disabled: every lookup misses. shared backends are seen by every process
+
+  shared = False
+
+  def __init__(self):
+    self.hits = self.misses = self.evictions = 0
+
+  def get_many(self, keys):
+    self.misses += len(keys)
+    return [None] * len(keys)
+
+  def set_many(self, mapping, ttl=None):
+    pass
+
+  def delete(self, *keys):
+    pass
+
+  def counter(self, key):
+    return 0
+
+  def incr(self, key):
+    return 0
+
+  def clear(self):
+    pass
+
+  def stats(self):
+    return {'backend': 'null', 'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'entries': 0}
+
+
+class LRUCache(NullCache):
+  # in-process cache bounded by entry count, least recently used entries are evicted
+  # first and entries older than their ttl are treated as misses. counters are kept
+  # apart from the entries so eviction can never reset them
+
+  def __init__(self, max_entries=1024, ttl=60):
+    super(LRUCache, self).__init__()
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.expirations = 0
+    self.entries = OrderedDict()
+    self.counters = {}
+    self.lock = threading.Lock()
+
+  def get_many(self, keys):
+    now = time.monotonic()
+    values = []
+    with self.lock:
+      for key in keys:
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= now:
+          del self.entries[key]
+          self.expirations += 1
+          entry = None
+        if entry is None:
+          self.misses += 1
+          values.append(None)
+        else:
+          self.hits += 1
+          self.entries.move_to_end(key)
+          values.append(entry[1])
+    return values
+
+  def set_many(self, mapping, ttl=None):
+    expires = time.monotonic() + (ttl or self.ttl)
+    with self.lock:
+      for key, value in mapping.items():
+        self.entries[key] = (expires, value)
+        self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+        self.evictions += 1
+
+  def delete(self, *keys):
+    with self.lock:
+      for key in keys:
+        self.entries.pop(key, None)
+
+  def counter(self, key):
+    return self.counters.get(key, 0)
+
+  def incr(self, key):
+    with self.lock:
+      self.counters[key] = self.counters.get(key, 0) + 1
+      return self.counters[key]
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+
+  def stats(self):
+    return {'backend': 'lru', 'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'expirations': self.expirations,
+            'entries': len(self.entries), 'max_entries': self.max_entries}
+
+
+class RedisCache(NullCache):
+  # shared cache on any server speaking the redis protocol. size limits and eviction
+  # are the server's maxmemory policy, its evicted_keys count is reported in stats.
+  # use a volatile-* policy: counters are stored without a ttl and must not be evicted
+
+  shared = True
+
+  def __init__(self, url, ttl=60, prefix='fyyur:'):
+    super(RedisCache, self).__init__()
+    try:
+      import redis
+    except ImportError:
+      raise RuntimeError('CACHE_BACKEND = "redis" requires the redis package')
+    self.client = redis.Redis.from_url(url)
+    self.ttl = ttl
+    self.prefix = prefix
+
+  def get_many(self, keys):
+    if not keys:
+      return []
+    values = [None if value is None else pickle.loads(value)
+              for value in self.client.mget([self.prefix + key for key in keys])]
+    misses = values.count(None)
+    self.misses += misses
+    self.hits += len(values) - misses
+    return values
+
+  def set_many(self, mapping, ttl=None):
+    pipeline = self.client.pipeline()
+    for key, value in mapping.items():
+      pipeline.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.ttl)
+    pipeline.execute()
+
+  def delete(self, *keys):
+    if keys:
+      self.client.delete(*[self.prefix + key for key in keys])
+
+  def counter(self, key):
+    return int(self.client.get(self.prefix + key) or 0)
+
+  def incr(self, key):
+    return self.client.incr(self.prefix + key)
+
+  def clear(self):
+    keys = list(self.client.scan_iter(self.prefix + '*'))
+    if keys:
+      self.client.delete(*keys)
+
+  def stats(self):
+    info = self.client.info('stats')
+    return {'backend': 'redis', 'hits': self.hits, 'misses': self.misses,
+            'evictions': info.get('evicted_keys', 0),
+            'expirations': info.get('expired_keys', 0),
+            'entries': self.client.dbsize()}
+
+
+# ----------------------------------------------------------------------------#
+# Extension.
+# ----------------------------------------------------------------------------#
+
+
+class Cache(object):
+  # CACHE_BACKEND selects 'lru' (per process, the default), 'redis' or 'null'
+
+  def __init__(self, app=None):
+    self.backend = NullCache()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    backend = app.config.get('CACHE_BACKEND', 'lru')
+    ttl = app.config.get('CACHE_TTL', 60)
+    if backend == 'lru':
+      self.backend = LRUCache(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+    elif backend == 'redis':
+      self.backend = RedisCache(app.config['CACHE_REDIS_URL'], ttl)
+    elif backend == 'null':
+      self.backend = NullCache()
+    else:
+      raise ValueError('unknown CACHE_BACKEND ' + repr(backend))
+    app.extensions['cache'] = self
+
+  def get(self, key):
+    return self.backend.get_many([key])[0]
+
+  def get_many(self, keys):
+    return self.backend.get_many(list(keys))
+
+  def set(self, key, value, ttl=None):
+    self.backend.set_many({key: value}, ttl)
+
+  def set_many(self, mapping, ttl=None):
+    if mapping:
+      self.backend.set_many(mapping, ttl)
+
+  def delete(self, *keys):
+    self.backend.delete(*keys)
+
+  @property
+  def shared(self):
+    return self.backend.shared
+
+  def version(self, namespace):
+    # keys built with the current version of a namespace are all dropped at once by
+    # bumping it, used for pages with unbounded key sets like the /shows cursors
+    return self.backend.counter('version:' + namespace)
+
+  def bump(self, namespace):
+    self.backend.incr('version:' + namespace)
+
+  def clear(self):
+    self.backend.clear()
+
+  def stats(self):
+    return self.backend.stats()
+
+
+cache = Cache()
+
+
+# ----------------------------------------------------------------------------#
+# Pages.
+# ----------------------------------------------------------------------------#
+
+
+def page_key(path, namespace=None):
+  if namespace is None:
+    return 'page:' + path
+  return 'page:%s:%s:%s' % (namespace, cache.version(namespace), path)
+
+
+def area_key(city, state):
+  return 'area:%s:%s' % (state, city)
+
+
+def page_path(query_args=()):
+  # the request path with the query args a view reads, in a fixed order. requests that
+  # only differ in other args render the same page, they share its entry and eviction
+  values = [(name, request.args[name]) for name in query_args if name in request.args]
+  return request.path + ('?' + urlencode(values) if values else '')
+
+
+def cached_page(namespace=None, query_args=()):
+  # cache the rendered body of successful GET responses by path and the query args the
+  # view reads. requests with pending flash messages render fresh, since the layout
+  # shows them
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      if request.method != 'GET' or session.get('_flashes'):
+        return current_app.ensure_sync(view)(*args, **kwargs)
+      key = page_key(page_path(query_args), namespace)
+      body = cache.get(key)
+      if body is not None:
+        return body
+      response = make_response(current_app.ensure_sync(view)(*args, **kwargs))
+      if response.status_code == 200:
+        cache.set(key, response.get_data(as_text=True))
+      return response
+    return wrapper
+  return decorator
+
+
+# ----------------------------------------------------------------------------#
+# Invalidation.
+# ----------------------------------------------------------------------------#
+
+# each write evicts exactly the pages and fragments that render the rows it changed,
+# and bumps the 'data' version the streamed json collections derive their etags from.
+# venue pages list their artists' names and artist pages their venues' names, so a
+# venue or artist write also evicts the pages on the other side of its shows
+
+
+def venue_artist_ids(venue_id):
+  return [artist_id for artist_id, in db.session.query(
+      Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+
+
+def artist_venue_ids(artist_id):
+  return [venue_id for venue_id, in db.session.query(
+      Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+
+
+def evict_venue(venue_id, areas, artist_ids=None):
+  # areas are the (city, state) pairs the venue was listed under before and after
+  # the write
+  if artist_ids is None:
+    artist_ids = venue_artist_ids(venue_id)
+  cache.delete(
+      page_key('/venues'), 'areas', page_key('/venues/%s' % venue_id),
+      *[area_key(city, state) for city, state in areas] +
+      [page_key('/artists/%s' % artist_id) for artist_id in artist_ids])
+  cache.bump('shows')
+  cache.bump('data')
+
+
+def evict_artist(artist_id, venue_ids=None):
+  if venue_ids is None:
+    venue_ids = artist_venue_ids(artist_id)
+  cache.delete(
+      page_key('/artists'), page_key('/artists/%s' % artist_id),
+      *[page_key('/venues/%s' % venue_id) for venue_id in venue_ids])
+  cache.bump('shows')
+  cache.bump('data')
+
+
+def evict_show(venue_id, artist_id):
+  # a new show changes both detail pages, the venue's upcoming show count in its area
+  # block and the shows feed
+  area = db.session.query(Venue.city, Venue.state).filter(
+      Venue.id == venue_id).first()
+  cache.delete(
+      page_key('/venues'), page_key('/venues/%s' % venue_id),
+      page_key('/artists/%s' % artist_id), *[area_key(*area)] if area else [])
+  cache.bump('shows')
+  cache.bump('data')
@@ -0,0 +1,362 @@
+import os
+import re
+from datetime import timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func
+import assets
+import benchmark
+from bulk import export_rows, import_rows
+from cache import cache
+from counters import counter_mismatches, refresh_counters
+from dataset import generate
+from extensions import db
+from models.models import Artist, Show, Venue
+from schema import schema_problems
+from templating import compile_templates
+
+fyyur = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+# ----------------------------------------------------------------------------#
+# Query plans.
+# ----------------------------------------------------------------------------#
+
+# sequential scans on Show as reported by postgres EXPLAIN and sqlite EXPLAIN QUERY PLAN
+SEQ_SCAN_ON_SHOW = {
+    'postgresql': re.compile(r'Seq Scan on "?Show"?'),
+    'sqlite': re.compile(r'\bSCAN "?Show"?(?! USING (COVERING )?INDEX)'),
+}
+
+
+def explain_routes():
+  # the read routes and the requests that drive them against the seeded database
+  venue_id = db.session.query(func.min(Venue.id)).scalar()
+  artist_id = db.session.query(func.min(Artist.id)).scalar()
+  # a week from the first show, inside the calendar's longest window
+  start = db.session.query(func.min(Show.start_time)).scalar().date()
+  window = 'start=%s&end=%s' % (start, start + timedelta(days=7))
+  return [
+      ('GET', '/venues', None),
+      ('GET', '/venues/%s' % venue_id, None),
+      ('POST', '/venues/search', {'search_term': 'a'}),
+      ('GET', '/artists', None),
+      ('GET', '/artists/%s' % artist_id, None),
+      ('POST', '/artists/search', {'search_term': 'a'}),
+      ('GET', '/shows', None),
+      ('GET', '/shows?when=upcoming', None),
+      ('GET', '/shows?when=past', None),
+      ('GET', '/api/v1/venues', None),
+      ('GET', '/api/v1/artists', None),
+      ('GET', '/api/v1/shows', None),
+      ('GET', '/api/v1/shows?when=past&' + window, None),
+      ('GET', '/api/v1/calendar?' + window, None),
+      ('GET', '/api/v1/calendar?per=week&by=venue&' + window, None),
+      ('GET', '/api/v1/venues/%s/availability?%s' % (venue_id, window), None),
+      ('GET', '/api/v1/artists/%s/availability?%s' % (artist_id, window), None),
+  ]
+
+
+def explain_statement(connection, dialect, statement, parameters):
+  # planners prefer sequential scans on small tables, so they are switched off for the
+  # postgres check: any sequential scan left in the plan has no usable index
+  if dialect == 'postgresql':
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters)
+    return '\n'.join(row[0] for row in rows)
+  rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+  return '\n'.join(row[-1] for row in rows)
+
+
+@fyyur.command('explain')
+def explain():
+  """Fail if any read route's queries sequentially scan Show."""
+  engine = db.engine
+  dialect = engine.dialect.name
+  if dialect not in SEQ_SCAN_ON_SHOW:
+    raise click.ClickException('EXPLAIN check does not support ' + dialect)
+
+  statements = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip().upper().startswith('SELECT') and '"Show"' in statement:
+      statements.append((statement, parameters))
+
+  failures = 0
+  client = current_app.test_client()
+  for method, url, form in explain_routes():
+    statements.clear()
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+      response = client.open(url, method=method, data=form)
+      # the api lists stream their rows, so their queries run while the body is read
+      response.get_data()
+      response.close()
+    finally:
+      event.remove(engine, 'before_cursor_execute', record)
+    if response.status_code >= 400:
+      raise click.ClickException(
+          '%s %s returned %s' % (method, url, response.status_code))
+
+    for statement, parameters in statements:
+      with engine.connect() as connection:
+        with connection.begin() as transaction:
+          plan = explain_statement(connection, dialect, statement, parameters)
+          transaction.rollback()
+      if SEQ_SCAN_ON_SHOW[dialect].search(plan):
+        failures += 1
+        click.echo('%s %s: sequential scan on Show\n%s\n%s\n' %
+                   (method, url, statement, plan))
+    click.echo('%s %s: %d statement(s) on Show checked' %
+               (method, url, len(statements)))
+
+  if failures:
+    raise click.ClickException(
+        '%d statement(s) sequentially scan Show' % failures)
+
+
+# ----------------------------------------------------------------------------#
+# Upcoming show counters.
+# ----------------------------------------------------------------------------#
+
+
+@fyyur.command('refresh-counters')
+@click.option('--all', 'everything', is_flag=True,
+              help='Recompute every row instead of only rows whose next show has started.')
+def refresh_counters_command(everything):
+  """Age started shows out of the upcoming show counters. Run this periodically."""
+  for model in (Venue, Artist):
+    count = refresh_counters(model, stale_only=not everything)
+    click.echo('%s: %d row(s) refreshed' % (model.__tablename__, count))
+  db.session.commit()
+  # the listings show the counters
+  cache.bump('shows')
+  cache.bump('data')
+
+
+@fyyur.command('check-counters')
+@click.option('--fix', is_flag=True, help='Recompute the rows that are out of date.')
+def check_counters(fix):
+  """Compare the upcoming show counters against the Show table."""
+  mismatches = 0
+  for model in (Venue, Artist):
+    rows = counter_mismatches(model)
+    mismatches += len(rows)
+    for row in rows:
+      click.echo('%s %s: upcoming_shows_count %s (expected %s), next_show_at %s (expected %s)' % (
+          model.__tablename__, row.id, row.upcoming_shows_count, row.expected_count,
+          row.next_show_at, row.expected_next_show_at))
+    if fix and rows:
+      refresh_counters(model, [row.id for row in rows])
+  if fix:
+    db.session.commit()
+    cache.bump('shows')
+    cache.bump('data')
+  elif mismatches:
+    raise click.ClickException('%d counter(s) out of date' % mismatches)
+  click.echo('%d counter(s) out of date' % mismatches)
+
+
+# ----------------------------------------------------------------------------#
+# Schema.
+# ----------------------------------------------------------------------------#
+
+
+@fyyur.command('check-schema')
+def check_schema_command():
+  """Fail if the database isn't at the migrations head or differs from the models."""
+  problems = schema_problems()
+  for problem in problems:
+    click.echo(problem)
+  if problems:
+    raise click.ClickException('%d schema difference(s)' % len(problems))
+  click.echo('schema up to date')
+
+
+# ----------------------------------------------------------------------------#
+# Import / export.
+# ----------------------------------------------------------------------------#
+
+KINDS = click.Choice(['venues', 'artists', 'shows'])
+FORMATS = click.Choice(['csv', 'ndjson'])
+
+
+def open_text(path, mode='r'):
+  # '-' is stdin or stdout, files are opened with newline='' as the csv module expects
+  if path == '-':
+    return click.open_file(path, mode)
+  return open(path, mode, newline='')
+
+
+def file_format(path, format):
+  if format:
+    return format
+  return 'csv' if path.endswith('.csv') else 'ndjson'
+
+
+@fyyur.command('import')
+@click.argument('kind', type=KINDS)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', type=FORMATS, help='Defaults to csv for .csv files, ndjson otherwise.')
+@click.option('--rejects', type=click.Path(dir_okay=False),
+              help='Where rejected rows go, defaults to PATH.rejects.ndjson.')
+@click.option('--batch-size', default=1000, show_default=True)
+def import_command(kind, path, format, rejects, batch_size):
+  """Import venues, artists or shows from a csv or ndjson file.
+
+  Rows are validated like the create forms. Shows reference existing venue
+  and artist ids. Csv genres are separated by ';'.
+  """
+  format = file_format(path, format)
+  rejects = rejects or ('fyyur' if path == '-' else path) + '.rejects.ndjson'
+  with open_text(path) as file, open(rejects, 'w') as rejects_file:
+    with current_app.test_request_context():
+      imported, rejected = import_rows(kind, file, format, rejects_file, batch_size)
+  cache.clear()
+  cache.bump('shows')
+  cache.bump('data')
+  click.echo('%d %s imported, %d rejected (see %s)' % (imported, kind, rejected, rejects))
+
+
+@fyyur.command('export')
+@click.argument('kind', type=KINDS)
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False, allow_dash=True),
+              help='Defaults to standard output.')
+@click.option('--format', type=FORMATS, help='Defaults to csv for .csv files, ndjson otherwise.')
+@click.option('--batch-size', default=1000, show_default=True)
+def export_command(kind, output, format, batch_size):
+  """Export venues, artists or shows as csv or ndjson."""
+  format = file_format(output, format)
+  with open_text(output, 'w') as file:
+    count = export_rows(kind, file, format, batch_size)
+  if output != '-':
+    click.echo('%d %s exported to %s' % (count, kind, output))
+
+
+# ----------------------------------------------------------------------------#
+# Synthetic data and benchmarks.
+# ----------------------------------------------------------------------------#
+
+
+@fyyur.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=2000, show_default=True)
+@click.option('--shows', default=20000, show_default=True)
+@click.option('--seed', default=0, show_default=True,
+              help='The same seed always generates the same rows.')
+def seed_command(venues, artists, shows, seed):
+  """Add a deterministic synthetic dataset to the database."""
+  generate(venues, artists, shows, seed)
+  cache.clear()
+  cache.bump('shows')
+  cache.bump('data')
+  click.echo('%d venues, %d artists and %d shows added' % (venues, artists, shows))
+
+
+@fyyur.command('benchmark')
+@click.option('--iterations', default=50, show_default=True,
+              help='Timed requests per route.')
+@click.option('--baseline', default='benchmark.json', show_default=True,
+              type=click.Path(dir_okay=False), help='Baseline to compare against.')
+@click.option('--update', is_flag=True, help='Write the results as the new baseline.')
+@click.option('--tolerance', default=0.2, show_default=True,
+              help='Allowed p95 latency and peak memory growth over the baseline.')
+@click.option('--cached', is_flag=True, help='Keep the page cache on.')
+@click.option('--writes', is_flag=True,
+              help='Also drive the create and edit routes, which add and change rows.')
+def benchmark_command(iterations, baseline, update, tolerance, cached, writes):
+  """Time every route and fail on regressions against the baseline."""
+  report = benchmark.run(current_app, iterations, cached, writes)
+  click.echo('%-44s %9s %9s %9s %7s %9s' % (
+      'route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'peak KiB'))
+  for name, row in sorted(report['routes'].items()):
+    click.echo('%-44s %9.2f %9.2f %9.2f %7d %9.0f' % (
+        name, row['p50_ms'], row['p95_ms'], row['p99_ms'], row['queries'], row['peak_kb']))
+  if report['meta']['skipped']:
+    click.echo('skipped: ' + ', '.join(report['meta']['skipped']))
+
+  previous = benchmark.load_baseline(baseline)
+  if update or previous is None:
+    benchmark.save_baseline(baseline, report)
+    click.echo('baseline written to ' + baseline)
+    return
+  found = benchmark.regressions(report, previous, tolerance)
+  for line in found:
+    click.echo('regression: ' + line)
+  if found:
+    raise click.ClickException('%d regression(s) against %s' % (len(found), baseline))
+  click.echo('no regressions against ' + baseline)
+
+
+@fyyur.command('benchmark-async')
+@click.option('--threads', default=8, show_default=True,
+              help='Concurrent requests, like the worker threads of a server.')
+@click.option('--seconds', default=10, show_default=True, help='Duration of each mode.')
+def benchmark_async_command(threads, seconds):
+  """Compare sync and async views under concurrent load."""
+  results = benchmark.compare_async(current_app._get_current_object(), threads, seconds)
+  click.echo('%-6s %9s %9s %9s %9s %7s' % (
+      'mode', 'requests', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+  for mode in ('sync', 'async'):
+    row = results[mode]
+    click.echo('%-6s %9d %9.1f %9.2f %9.2f %7d' % (
+        mode, row['requests'], row['rps'], row['p50_ms'] or 0, row['p99_ms'] or 0,
+        row['errors']))
+
+
+@fyyur.command('benchmark-dates')
+@click.option('--rows', default=500, show_default=True, help='Shows on the page.')
+def benchmark_dates_command(rows):
+  """Per row cost of formatting show start times, before and after dates.py."""
+  results = benchmark.date_formatting(rows)
+  click.echo('legacy string round trip: %8.2f us/row' % results['legacy_us'])
+  click.echo('datetime filter, cold:    %8.2f us/row' % results['cold_us'])
+  click.echo('datetime filter, warm:    %8.2f us/row' % results['warm_us'])
+
+
+@fyyur.command('startup')
+@click.option('--runs', default=5, show_default=True, help='Fresh interpreters to time.')
+@click.option('--top', default=15, show_default=True, help='Packages to list.')
+@click.option('--report', type=click.Path(dir_okay=False, writable=True),
+              help='Also write the raw -X importtime report of the last run here.')
+def startup_command(runs, top, report):
+  """Time a server worker's cold start and list the packages it imports."""
+  try:
+    results = benchmark.startup(runs)
+  except RuntimeError as error:
+    raise click.ClickException('create_app failed: %s' % error)
+  click.echo('create_app(cli=False): %.1f ms median of %d runs' % (
+      results['median_ms'], results['runs']))
+  click.echo('imports: %.1f ms in %d modules' % (results['imports_ms'], results['modules']))
+  click.echo('%-24s %9s' % ('package', 'self ms'))
+  for package, self_ms in results['packages'][:top]:
+    click.echo('%-24s %9.1f' % (package, self_ms))
+  if report:
+    with open(report, 'w') as file:
+      file.write(results['importtime'])
+    click.echo('import report written to ' + report)
+
+
+@fyyur.command('compile-templates')
+def compile_templates_command():
+  """Fill the template bytecode cache before the servers start."""
+  directory = current_app.config.get('TEMPLATE_CACHE_DIR')
+  if not directory:
+    raise click.ClickException('TEMPLATE_CACHE_DIR is not set')
+  names = compile_templates(current_app)
+  click.echo('compiled %d templates into %s' % (len(names), directory))
+
+
+@fyyur.command('build-assets')
+def build_assets_command():
+  """Bundle, fingerprint and precompress the static files."""
+  static_folder = current_app.static_folder
+  manifest = assets.build(static_folder)
+  click.echo('built %d files into %s' % (len(manifest), os.path.join(static_folder, assets.BUILD)))
+  for name in sorted(assets.BUNDLES):
+    path = os.path.join(static_folder, *manifest[name].split('/'))
+    sizes = ['%s %d' % (label, os.path.getsize(path + suffix))
+             for label, suffix in (('raw', ''), ('gzip', '.gz'), ('brotli', '.br'))
+             if os.path.exists(path + suffix)]
+    click.echo('%-12s %s (%s bytes)' % (name, manifest[name], ', '.join(sizes)))
@@ -1,11 +1,171 @@
 import os
-SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
 
-# Connect to the database
-SQLALCHEMY_DATABASE_URI = "postgresql://postgres@localhost:5432/fyyur"
-SQLALCHEMY_TRACK_MODIFICATIONS = False
+def env_int(name, default):
+  value = os.environ.get(name)
+  return default if value in (None, '') else int(value)
+
+
+def env_bool(name, default):
+  value = os.environ.get(name)
+  return default if value in (None, '') else value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_url(url):
+  # heroku style postgres:// urls are not accepted by sqlalchemy 1.4
+  if url.startswith('postgres://'):
+    url = 'postgresql://' + url[len('postgres://'):]
+  return url
+
+
+# ----------------------------------------------------------------------------#
+# Profiles.
+# ----------------------------------------------------------------------------#
+
+# FYYUR_ENV selects the profile: development (the default of the flask command and the
+# dev server), production (the default of wsgi.py, which gunicorn and uwsgi run) or testing.
+# every setting below can be overridden from the environment where it reads one
+
+
+class Config(object):
+  SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
+
+  # Enable debug mode.
+  DEBUG = False
+
+  # Connect to the database
+  SQLALCHEMY_DATABASE_URI = database_url(
+      os.environ.get('DATABASE_URL', 'postgresql://postgres@localhost:5432/fyyur'))
+  SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+  # Read replicas for the read-only views, comma separated in DATABASE_REPLICA_URLS.
+  # a user's requests go to the primary for REPLICA_STICKY_SECONDS after their last
+  # write, keep it above the replicas' usual lag. pages rendered from a lagging replica
+  # can stay in the page cache for up to CACHE_TTL
+  SQLALCHEMY_REPLICA_URIS = [
+      database_url(url.strip()) for url in
+      os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+  REPLICA_STICKY_SECONDS = env_int('REPLICA_STICKY_SECONDS', 5)
+
+  # Connection pool, per process: every worker holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW
+  # connections, keep workers * that below the server's max_connections. pre-ping
+  # replaces connections the server or a proxy closed, recycle retires connections
+  # older than that many seconds, and statements running longer than
+  # DB_STATEMENT_TIMEOUT_MS are cancelled by postgres (0 disables the timeout)
+  DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+  DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 10)
+  DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)
+  DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)
+  DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+  DB_STATEMENT_TIMEOUT_MS = env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+
+  # What servers do on startup when the database isn't migrated to the latest revision
+  # or the models don't match it: 'warn', 'error' (refuse to start) or 'off'
+  SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK', 'warn')
+
+  # Writes rolled back by a serialization failure or a deadlock are run again up to
+  # this many times
+  WRITE_RETRIES = env_int('WRITE_RETRIES', 3)
+
+  # Serve the detail pages and the shows feed with async views that run their queries
+  # concurrently on sqlalchemy's asyncio engine, needs asyncpg or aiosqlite installed
+  ASYNC_VIEWS = env_bool('ASYNC_VIEWS', False)
+
+  # Compiled templates are kept in TEMPLATE_CACHE_DIR, shared by the workers of a host
+  # (empty to disable). with TEMPLATES_AUTO_RELOAD every render checks the template file
+  # for changes, None follows DEBUG. with WARM_UP servers render every page once, and
+  # build the in-process search indexes off postgres, before they take traffic
+  TEMPLATE_CACHE_DIR = os.environ.get(
+      'TEMPLATE_CACHE_DIR', os.path.join(basedir, 'instance', 'templates'))
+  TEMPLATES_AUTO_RELOAD = None
+  WARM_UP = env_bool('WARM_UP', True)
+
+  # Built assets (`flask fyyur build-assets`) have their content hash in their names
+  # and are cached by browsers for ASSETS_MAX_AGE seconds
+  ASSETS_MAX_AGE = env_int('ASSETS_MAX_AGE', 365 * 24 * 3600)
+
+  # Shows listing page size, clients can ask for smaller or larger pages up to the max
+  SHOWS_PER_PAGE = 30
+  SHOWS_MAX_PER_PAGE = 100
+
+  # Longest window, in days, the calendar api aggregates over
+  CALENDAR_MAX_DAYS = 731
+
+  # Maximum number of venues or artists returned by a search
+  SEARCH_RESULTS_LIMIT = 50
+
+  # Rendered page and fragment cache: 'lru' (per process), 'redis' or 'null' to disable.
+  # a write only evicts pages from the lru cache of the process that served it, the
+  # other processes serve stale copies for up to CACHE_TTL, so servers running several
+  # workers must use 'redis' (gunicorn refuses to start them with 'lru')
+  CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'lru')
+  CACHE_MAX_ENTRIES = env_int('CACHE_MAX_ENTRIES', 1024)
+  CACHE_TTL = env_int('CACHE_TTL', 60)
+  CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+  # Request profiling: statements and requests slower than these many milliseconds are
+  # logged to the 'fyyur.profile' logger (None to disable), the Server-Timing header
+  # reports each request's database and render time, and the last PROFILE_BUFFER_SIZE
+  # requests are aggregated by /_profile in debug mode
+  PROFILE_SLOW_QUERY_MS = env_int('PROFILE_SLOW_QUERY_MS', 100)
+  PROFILE_SLOW_REQUEST_MS = env_int('PROFILE_SLOW_REQUEST_MS', 500)
+  PROFILE_SERVER_TIMING = env_bool('PROFILE_SERVER_TIMING', True)
+  PROFILE_BUFFER_SIZE = env_int('PROFILE_BUFFER_SIZE', 1000)
+
+
+class Development(Config):
+  DEBUG = True
+
+
+class Production(Config):
+  # the secret key must be shared by all workers, so it has to come from the environment
+  SECRET_KEY = os.environ.get('SECRET_KEY')
+  TEMPLATES_AUTO_RELOAD = False
+  # servers run several workers, pages are only cached in a shared redis cache
+  CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'null')
+  PROFILE_SERVER_TIMING = env_bool('PROFILE_SERVER_TIMING', False)
+
+
+class Testing(Config):
+  TESTING = True
+  WTF_CSRF_ENABLED = False
+  SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite://')
+  CACHE_BACKEND = 'null'
+  SCHEMA_CHECK = 'off'
+  TEMPLATE_CACHE_DIR = None
+  WARM_UP = False
+
+
+profiles = {
+    'development': Development,
+    'production': Production,
+    'testing': Testing,
+}
+
+
+def profile(name=None):
+  name = name or os.environ.get('FYYUR_ENV', 'development')
+  try:
+    return profiles[name]
+  except KeyError:
+    raise ValueError('unknown FYYUR_ENV ' + repr(name))
+
+
+def engine_options(config):
+  # SQLALCHEMY_ENGINE_OPTIONS for the pool settings above. sqlite has no server side
+  # pool or timeout to configure
+  uri = config['SQLALCHEMY_DATABASE_URI']
+  if uri.startswith('sqlite'):
+    return {}
+  options = dict()
+  options['pool_size'] = config['DB_POOL_SIZE']
+  options['max_overflow'] = config['DB_MAX_OVERFLOW']
+  options['pool_timeout'] = config['DB_POOL_TIMEOUT']
+  options['pool_recycle'] = config['DB_POOL_RECYCLE']
+  options['pool_pre_ping'] = config['DB_POOL_PRE_PING']
+  if uri.startswith('postgresql') and config['DB_STATEMENT_TIMEOUT_MS']:
+    options['connect_args'] = {
+        'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT_MS']}
+  return options
@@ -0,0 +1,75 @@
+from sqlalchemy import and_, func, or_, select, update
+from extensions import db
+from models.models import Artist, Show, Venue
+from queries import upcoming_shows_filter, utc_now
+
+
+# ----------------------------------------------------------------------------#
+# Upcoming show counters.
+# ----------------------------------------------------------------------------#
+
+# Venue and Artist carry a denormalized upcoming_shows_count and next_show_at so
+# listing pages read them by primary key instead of counting Show. They are refreshed
+# for the rows a write touches, and for rows whose next show has started (see
+# refresh_counters(stale_only=True), run periodically by `flask fyyur refresh-counters`)
+
+
+def show_column(model):
+  return Show.venue_id if model is Venue else Show.artist_id
+
+
+def refresh_counters(model, ids=None, stale_only=False, now=None):
+  # recompute the counters with one set-based UPDATE, either for the given ids, for
+  # rows whose next show is no longer upcoming, or for every row
+  now = now or utc_now()
+  upcoming = and_(show_column(model) == model.id, upcoming_shows_filter(now))
+  statement = update(model).values(
+      upcoming_shows_count=select(func.count(Show.id)).where(
+          upcoming).scalar_subquery(),
+      next_show_at=select(func.min(Show.start_time)).where(
+          upcoming).scalar_subquery()
+  ).execution_options(synchronize_session=False)
+  if ids is not None:
+    ids = list(ids)
+    if not ids:
+      return 0
+    statement = statement.where(model.id.in_(ids))
+  if stale_only:
+    statement = statement.where(model.next_show_at < now)
+  return db.session.execute(statement).rowcount
+
+
+def refresh_show_counters(venue_ids=(), artist_ids=()):
+  # called in the same transaction as the write that changed the shows
+  db.session.flush()
+  refresh_counters(Venue, venue_ids)
+  refresh_counters(Artist, artist_ids)
+
+
+def upcoming_counters(model, ids):
+  # read the stored counters for many venues or artists by primary key
+  counts = dict.fromkeys(ids, 0)
+  if counts:
+    counts.update(db.session.query(model.id, model.upcoming_shows_count).filter(
+        model.id.in_(counts)).all())
+  return counts
+
+
+def counter_mismatches(model, now=None):
+  # rows whose stored counters differ from the counts in Show
+  now = now or utc_now()
+  column = show_column(model)
+  truth = db.session.query(
+      column.label('id'),
+      func.count(Show.id).label('upcoming_shows_count'),
+      func.min(Show.start_time).label('next_show_at')
+  ).filter(upcoming_shows_filter(now)).group_by(column).subquery()
+  expected_count = func.coalesce(truth.c.upcoming_shows_count, 0)
+  return db.session.query(
+      model.id, model.upcoming_shows_count, model.next_show_at,
+      expected_count.label('expected_count'),
+      truth.c.next_show_at.label('expected_next_show_at')
+  ).outerjoin(truth, truth.c.id == model.id).filter(or_(
+      model.upcoming_shows_count != expected_count,
+      model.next_show_at.is_distinct_from(truth.c.next_show_at)
+  )).order_by(model.id).all()
@@ -0,0 +1,131 @@
+import random
+from datetime import timedelta
+from counters import refresh_counters
+from forms import GENRES
+from extensions import db
+from models.models import Artist, Show, Venue
+from queries import utc_now
+
+
+# ----------------------------------------------------------------------------#
+# Synthetic dataset.
+# ----------------------------------------------------------------------------#
+
+# deterministic for a given seed: the same arguments always generate the same rows.
+# cities, venue popularity and artist popularity follow long-tailed distributions
+# like real catalogs, and show times cluster on evenings and weekends
+
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('San Francisco', 'CA'),
+    ('Austin', 'TX'), ('Nashville', 'TN'), ('Seattle', 'WA'), ('Portland', 'OR'),
+    ('Atlanta', 'GA'), ('Denver', 'CO'), ('Boston', 'MA'), ('Philadelphia', 'PA'),
+    ('New Orleans', 'LA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'), ('Miami', 'FL'),
+    ('Oakland', 'CA'), ('Brooklyn', 'NY'), ('Houston', 'TX'), ('Phoenix', 'AZ'),
+    ('Memphis', 'TN'), ('Kansas City', 'MO'), ('Pittsburgh', 'PA'), ('Richmond', 'VA'),
+]
+VENUE_WORDS = ['Hall', 'Club', 'Lounge', 'Room', 'Theatre', 'Bar', 'Ballroom', 'Cellar',
+               'Garden', 'Tavern', 'Loft', 'Warehouse']
+NAME_WORDS = ['Blue', 'Velvet', 'Golden', 'Electric', 'Midnight', 'Silver', 'Wild',
+              'Crimson', 'Neon', 'Lucky', 'Broken', 'Paper', 'Iron', 'Echo', 'Sunset',
+              'Rebel', 'Lonely', 'Hollow', 'Crystal', 'Thunder', 'Violet', 'Honey']
+ARTIST_WORDS = ['Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Project',
+                'Brothers', 'Sisters', 'Kids', 'Ghosts', 'Machines', 'Wolves']
+
+
+def zipf_weights(count, exponent=1.1):
+  return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def genres(rng):
+  return rng.sample(GENRES, rng.choice([1, 1, 2, 2, 3]))
+
+
+def venue_rows(rng, count):
+  weights = zipf_weights(len(CITIES))
+  for index in range(count):
+    city, state = rng.choices(CITIES, weights)[0]
+    name = '%s %s %s' % (rng.choice(NAME_WORDS), rng.choice(NAME_WORDS),
+                         rng.choice(VENUE_WORDS))
+    yield dict(
+        name=name, city=city, state=state,
+        address='%d %s St' % (rng.randint(1, 9999), rng.choice(NAME_WORDS)),
+        phone='%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999),
+                                  rng.randint(0, 9999)),
+        genres=genres(rng), image_link=None,
+        facebook_link='https://www.facebook.com/venue%d' % index,
+        website_link='https://venue%d.example.com' % index,
+        seeking_talent=rng.random() < 0.3,
+        seeking_description=None, upcoming_shows_count=0)
+
+
+def artist_rows(rng, count):
+  weights = zipf_weights(len(CITIES))
+  for index in range(count):
+    city, state = rng.choices(CITIES, weights)[0]
+    name = '%s %s %s' % (rng.choice(['The', 'The', '']), rng.choice(NAME_WORDS),
+                         rng.choice(ARTIST_WORDS))
+    yield dict(
+        name=name.strip(), city=city, state=state,
+        phone='%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(200, 999),
+                                  rng.randint(0, 9999)),
+        genres=genres(rng), image_link=None,
+        facebook_link='https://www.facebook.com/artist%d' % index,
+        website_link=None, seeking_venues=rng.random() < 0.4,
+        seeking_description=None, upcoming_shows_count=0)
+
+
+def show_rows(rng, count, venue_ids, artist_ids, now):
+  # two years of history and one year of bookings ahead, one hour shows mostly 7pm-11pm
+  # and more often on fridays and saturdays. popular venues and artists get most shows.
+  # a venue or artist already booked at the drawn hour is redrawn, uniformly after a
+  # few tries so the most popular ones can fill up, and the show is dropped if that
+  # keeps failing
+  venue_weights = zipf_weights(len(venue_ids), 0.8)
+  artist_weights = zipf_weights(len(artist_ids), 0.8)
+  day_weights = [1, 1, 1.5, 2, 4, 4, 2]
+  start = (now - timedelta(days=730)).replace(minute=0, second=0, microsecond=0)
+  booked = set()
+  for index in range(count):
+    for attempt in range(20):
+      day = start + timedelta(days=rng.randint(0, 1094))
+      while rng.random() > day_weights[day.weekday()] / 4:
+        day = start + timedelta(days=rng.randint(0, 1094))
+      start_time = day.replace(hour=rng.choice([19, 20, 20, 21, 21, 22, 23]))
+      if attempt < 5:
+        venue_id = rng.choices(venue_ids, venue_weights)[0]
+        artist_id = rng.choices(artist_ids, artist_weights)[0]
+      else:
+        venue_id = rng.choice(venue_ids)
+        artist_id = rng.choice(artist_ids)
+      if ('v', venue_id, start_time) not in booked and ('a', artist_id, start_time) not in booked:
+        booked.add(('v', venue_id, start_time))
+        booked.add(('a', artist_id, start_time))
+        yield dict(venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+                   end_time=start_time + timedelta(hours=1))
+        break
+
+
+def insert(table, rows, batch_size):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) == batch_size:
+      db.session.execute(table.insert(), batch)
+      batch = []
+  if batch:
+    db.session.execute(table.insert(), batch)
+
+
+def generate(venues, artists, shows, seed=0, batch_size=5000, now=None):
+  # insert the dataset in one transaction and bring the counters up to date
+  rng = random.Random(seed)
+  now = now or utc_now()
+  insert(Venue.__table__, venue_rows(rng, venues), batch_size)
+  insert(Artist.__table__, artist_rows(rng, artists), batch_size)
+  venue_ids = [id for id, in db.session.query(Venue.id).order_by(Venue.id)]
+  artist_ids = [id for id, in db.session.query(Artist.id).order_by(Artist.id)]
+  if shows and venue_ids and artist_ids:
+    insert(Show.__table__, show_rows(rng, shows, venue_ids, artist_ids, now), batch_size)
+  refresh_counters(Venue, now=now)
+  refresh_counters(Artist, now=now)
+  db.session.commit()
@@ -0,0 +1,52 @@
+from datetime import datetime
+from functools import lru_cache
+
+
+# ----------------------------------------------------------------------------#
+# Date formatting.
+# ----------------------------------------------------------------------------#
+
+# the datetime filter of every show row. babel patterns and locales are compiled once
+# per (format, locale), datetimes are formatted without a string round trip, and the
+# formatted strings are memoized: shows start on the hour, so a page of shows has few
+# distinct start times. babel and dateutil are imported on first use, not on startup
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+# babel's own named formats, the ones FORMATS doesn't redefine are the locale's
+NAMED = ('short', 'medium', 'long', 'full')
+
+
+@lru_cache(maxsize=64)
+def compiled(format, locale):
+  # a function formatting datetimes in format. a named format is the locale's date and
+  # time patterns joined by its datetime format, as babel.dates.format_datetime does,
+  # anything else is a pattern
+  from babel import Locale
+  from babel.dates import get_date_format, get_datetime_format, get_time_format, parse_pattern
+  locale = Locale.parse(locale)
+  if format in FORMATS or format not in NAMED:
+    pattern = parse_pattern(FORMATS.get(format, format))
+    return lambda value: pattern.apply(value, locale)
+  date = get_date_format(format, locale)
+  time = get_time_format(format, locale)
+  joined = get_datetime_format(format, locale).replace("'", '')
+  return lambda value: joined.replace('{0}', time.apply(value, locale)).replace(
+      '{1}', date.apply(value, locale))
+
+
+@lru_cache(maxsize=4096)
+def format_value(value, format, locale):
+  return compiled(format, locale)(value)
+
+
+def format_datetime(value, format='medium', locale='en'):
+  # datetimes are formatted directly, only strings need to be parsed first
+  if not isinstance(value, datetime):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  return format_value(value, format, locale)
@@ -0,0 +1,13 @@
+from replicas import RoutingSQLAlchemy
+
+
+# ----------------------------------------------------------------------------#
+# Extensions.
+# ----------------------------------------------------------------------------#
+
+# the one instance of each flask extension, bound to the app by create_app. the models
+# and every module that queries import db from here, so a process has one metadata,
+# one engine and one connection pool. flask-migrate is only set up for the flask
+# command, create_app imports it then
+
+db = RoutingSQLAlchemy()
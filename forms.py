@@ -1,7 +1,15 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, Optional, URL
+
+# the genres venues and artists can pick from. stored values are matched exactly by
+# the genre filters, so they are spelled as here
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk',
+    'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
 
 
 class ShowForm(Form):
@@ -14,7 +22,12 @@ class ShowForm(Form):
   start_time = DateTimeField(
       'start_time',
       validators=[DataRequired()],
-      default=datetime.today()
+      default=datetime.utcnow
+  )
+  end_time = DateTimeField(
+      # empty for the default show duration
+      'end_time',
+      validators=[Optional()]
   )
 
 
@@ -93,27 +106,7 @@ class VenueForm(Form):
   genres = SelectMultipleField(
       # TODO implement enum restriction
       'genres', validators=[DataRequired()],
-      choices=[
-          ('Alternative', 'Alternative'),
-          ('Blues', 'Blues'),
-          ('Classical', 'Classical'),
-          ('Country', 'Country'),
-          ('Electronic', 'Electronic'),
-          ('Folk', 'Folk'),
-          ('Funk', 'Funk'),
-          ('Hip-Hop', 'Hip-Hop'),
-          ('Heavy Metal', 'Heavy Metal'),
-          ('Instrumental', 'Instrumental'),
-          ('Jazz', 'Jazz'),
-          ('Musical Theatre', 'Musical Theatre'),
-          ('Pop', 'Pop'),
-          ('Punk', 'Punk'),
-          ('R&B', 'R&B'),
-          ('Reggae', 'Reggae'),
-          ('Rock n Roll', 'Rock n Roll'),
-          ('Soul', 'Soul'),
-          ('Other', 'Other'),
-      ]
+      choices=[(genre, genre) for genre in GENRES]
   )
   facebook_link = StringField(
       'facebook_link', validators=[URL()]
@@ -201,27 +194,7 @@ class ArtistForm(Form):
   )
   genres = SelectMultipleField(
       'genres', validators=[DataRequired()],
-      choices=[
-          ('Alternative', 'Alternative'),
-          ('Blues', 'Blues'),
-          ('Classical', 'Classical'),
-          ('Country', 'Country'),
-          ('Electronic', 'Electronic'),
-          ('Folk', 'Folk'),
-          ('Funk', 'Funk'),
-          ('Hip-Hop', 'Hip-Hop'),
-          ('Heavy Metal', 'Heavy Metal'),
-          ('Instrumental', 'Instrumental'),
-          ('Jazz', 'Jazz'),
-          ('Musical Theatre', 'Musical Theatre'),
-          ('Pop', 'Pop'),
-          ('Punk', 'Punk'),
-          ('R&B', 'R&B'),
-          ('Reggae', 'Reggae'),
-          ('Rock n Roll', 'Rock n Roll'),
-          ('Soul', 'Soul'),
-          ('Other', 'Other'),
-      ]
+      choices=[(genre, genre) for genre in GENRES]
   )
   facebook_link = StringField(
       # TODO implement enum restriction
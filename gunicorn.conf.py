@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py. every worker has its own connection pool, size
+# WEB_CONCURRENCY together with DB_POOL_SIZE and DB_MAX_OVERFLOW so all of them fit
+# in the server's max_connections
+bind = '0.0.0.0:' + os.environ.get('PORT', '5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+wsgi_app = 'wsgi:app'
+preload_app = True
+
+
+def on_starting(server):
+  # the lru page cache is per process: a write evicts the pages of the worker that
+  # served it, the other workers keep serving their stale copies
+  from wsgi import app
+  if server.cfg.workers > 1 and app.config['CACHE_BACKEND'] == 'lru':
+    raise RuntimeError('CACHE_BACKEND = "lru" with %d workers, use "redis" or "null"'
+                       % server.cfg.workers)
+
+
+def pre_fork(server, worker):
+  # connections the master opened while loading the app are closed, not inherited
+  from wsgi import dispose_pool
+  dispose_pool()
@@ -0,0 +1,49 @@
+"""normalize stored genres and add gin indexes on venue and artist genres
+
+Revision ID: 3d9b6e2f1a47
+Revises: e7a31f5c08b2
+Create Date: 2026-10-17 15:12:41.208337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9b6e2f1a47'
+down_revision = 'e7a31f5c08b2'
+branch_labels = None
+depends_on = None
+
+
+# forms.GENRES when this revision was written
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk',
+    'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+
+
+def upgrade():
+    # the genre filters match array elements exactly, so backfill every stored genre
+    # to its canonical spelling: trimmed, known genres in their form's case, blanks and
+    # duplicates dropped, first occurrence order kept
+    for table in ('Venue', 'Artist'):
+        op.execute(sa.text(
+            'UPDATE "{table}" SET genres = ARRAY('
+            'SELECT coalesce(known.name, trim(given.name)) '
+            'FROM unnest(genres) WITH ORDINALITY AS given(name, position) '
+            'LEFT JOIN unnest(:genres) AS known(name) ON lower(known.name) = lower(trim(given.name)) '
+            'WHERE trim(given.name) <> \'\' '
+            'GROUP BY 1 ORDER BY min(given.position)) '
+            'WHERE genres IS NOT NULL'
+            .format(table=table)
+        ).bindparams(sa.bindparam('genres', GENRES, type_=postgresql.ARRAY(sa.String))))
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
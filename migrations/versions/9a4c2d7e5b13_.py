@@ -0,0 +1,39 @@
+"""add show end times and reject overlapping bookings
+
+Revision ID: 9a4c2d7e5b13
+Revises: 3d9b6e2f1a47
+Create Date: 2026-10-17 16:04:29.771093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c2d7e5b13'
+down_revision = '3d9b6e2f1a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing shows get the default two hour duration. the exclusion constraints fail
+    # to build while overlapping shows exist, postgres names the first conflicting pair
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "Show" SET end_time = start_time + interval \'2 hours\'')
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.create_check_constraint('ck_Show_end_after_start', 'Show', 'end_time > start_time')
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for column, name in (('venue_id', 'ex_Show_venue_booking'), ('artist_id', 'ex_Show_artist_booking')):
+        op.execute(
+            'ALTER TABLE "Show" ADD CONSTRAINT "{name}" '
+            'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)'
+            .format(name=name, column=column)
+        )
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_artist_booking', 'Show')
+    op.drop_constraint('ex_Show_venue_booking', 'Show')
+    op.drop_constraint('ck_Show_end_after_start', 'Show', type_='check')
+    op.drop_column('Show', 'end_time')
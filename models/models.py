@@ -1,10 +1,23 @@
-from flask_sqlalchemy import SQLAlchemy
+from datetime import timedelta
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import ARRAY, ExcludeConstraint
+from sqlalchemy.ext.compiler import compiles
+from extensions import db
 
-db = SQLAlchemy()
+
+# postgres stores genres as an array, with a gin index for the genre filters. sqlite
+# (test runs) has no array type and stores them as a json list
+GenreArray = ARRAY(db.String(120)).with_variant(db.JSON, 'sqlite')
 
 
 class Venue(db.Model):
   __tablename__ = 'Venue'
+  __table_args__ = (
+      db.Index('ix_Venue_state_city', 'state', 'city'),
+      db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin',
+               postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String)
@@ -12,35 +25,107 @@ class Venue(db.Model):
   state = db.Column(db.String(120))
   address = db.Column(db.String(120))
   phone = db.Column(db.String(120))
-  genres = db.Column(db.ARRAY(db.String(120)))
+  genres = db.Column(GenreArray)
   image_link = db.Column(db.String(500))
   facebook_link = db.Column(db.String(120))
   website_link = db.Column(db.String(120))
   seeking_talent = db.Column(db.Boolean)
   seeking_description = db.Column(db.String)
-  shows = db.relationship('Show', backref='venue_shows', lazy=True)
+  upcoming_shows_count = db.Column(
+      db.Integer, nullable=False, default=0, server_default='0')
+  next_show_at = db.Column(db.DateTime, index=True)
+  shows = db.relationship('Show', backref='venue_shows', lazy=True,
+                          order_by='Show.start_time', passive_deletes=True)
 
 
 class Artist(db.Model):
   __tablename__ = 'Artist'
+  __table_args__ = (
+      db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin',
+               postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   name = db.Column(db.String)
   city = db.Column(db.String(120))
   state = db.Column(db.String(120))
   phone = db.Column(db.String(120))
-  genres = db.Column(db.ARRAY(db.String(120)))
+  genres = db.Column(GenreArray)
   image_link = db.Column(db.String(500))
   facebook_link = db.Column(db.String(120))
   website_link = db.Column(db.String(120))
   seeking_venues = db.Column(db.Boolean)
   seeking_description = db.Column(db.String)
-  shows = db.relationship('Show', backref='artist_shows', lazy=True)
+  upcoming_shows_count = db.Column(
+      db.Integer, nullable=False, default=0, server_default='0')
+  next_show_at = db.Column(db.DateTime, index=True)
+  shows = db.relationship('Show', backref='artist_shows', lazy=True,
+                          order_by='Show.start_time', passive_deletes=True)
+
+
+# shows without an end time last SHOW_DURATION
+SHOW_DURATION = timedelta(hours=2)
+
+
+def default_end_time(context):
+  return context.get_current_parameters()['start_time'] + SHOW_DURATION
 
 
 class Show(db.Model):
   __tablename__ = 'Show'
+  __table_args__ = (
+      db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+      db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+      db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+      db.CheckConstraint('end_time > start_time', name='ck_Show_end_after_start'),
+      # a venue or an artist can't have two shows at the same time. [start_time, end_time)
+      # ranges, so back to back shows don't overlap
+      ExcludeConstraint(
+          ('venue_id', '='), (db.func.tsrange(db.column('start_time'), db.column('end_time')), '&&'),
+          name='ex_Show_venue_booking', using='gist'),
+      ExcludeConstraint(
+          ('artist_id', '='), (db.func.tsrange(db.column('start_time'), db.column('end_time')), '&&'),
+          name='ex_Show_artist_booking', using='gist'),
+  )
   id = db.Column(db.Integer, primary_key=True)
   start_time = db.Column(db.DateTime, nullable=False)
-  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+  end_time = db.Column(db.DateTime, nullable=False, default=default_end_time)
+  venue_id = db.Column(db.Integer, db.ForeignKey(
+      'Venue.id', ondelete='CASCADE'), nullable=False)
+  artist_id = db.Column(db.Integer, db.ForeignKey(
+      'Artist.id', ondelete='CASCADE'), nullable=False)
+
+
+# ----------------------------------------------------------------------------#
+# Bookings.
+# ----------------------------------------------------------------------------#
+
+# sqlite has no exclusion constraints: the Show table is created without them and
+# triggers reject overlapping shows instead, through the (venue_id, start_time) and
+# (artist_id, start_time) indexes. like the constraints they raise IntegrityError
+
+
+@compiles(ExcludeConstraint, 'sqlite')
+def skip_exclude_constraint(element, compiler, **kw):
+  return None
+
+
+# postgres needs btree_gist for the "venue_id WITH =" part of the constraints
+event.listen(Show.__table__, 'before_create', DDL(
+    'CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+
+BOOKING_TRIGGER = """
+CREATE TRIGGER "tr_Show_{column}_booking_{event}" BEFORE {event} ON "Show"
+WHEN EXISTS (
+  SELECT 1 FROM "Show" WHERE {column} = NEW.{column} AND id IS NOT NEW.id
+  AND start_time < NEW.end_time AND end_time > NEW.start_time)
+BEGIN
+  SELECT RAISE(ABORT, 'ex_Show_{table}_booking: overlapping show');
+END
+"""
+
+for _column, _table in (('venue_id', 'venue'), ('artist_id', 'artist')):
+  for _event in ('INSERT', 'UPDATE'):
+    event.listen(Show.__table__, 'after_create', DDL(BOOKING_TRIGGER.format(
+        column=_column, table=_table, event=_event)).execute_if(dialect='sqlite'))
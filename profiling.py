@@ -0,0 +1,182 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from flask import g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('fyyur.profile')
+
+
+# ----------------------------------------------------------------------------#
+# Measurements.
+# ----------------------------------------------------------------------------#
+
+# statements are timed with engine events and templates by the template class, and
+# both are added to the current request's totals in g.profile. statements and renders
+# that run after the view returns, like the chunks of a streamed response, are not
+# included in the request's totals
+
+
+def percentile(values, fraction):
+  # nearest rank
+  values = sorted(values)
+  return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class RequestProfile(object):
+
+  def __init__(self):
+    self.start = time.perf_counter()
+    self.queries = 0
+    self.db_ms = 0.0
+    self.render_ms = 0.0
+    self.slowest_ms = 0.0
+    self.slowest = None
+
+  def add_query(self, statement, elapsed_ms):
+    self.queries += 1
+    self.db_ms += elapsed_ms
+    if elapsed_ms > self.slowest_ms:
+      self.slowest_ms = elapsed_ms
+      self.slowest = statement
+
+
+def current_profile():
+  if has_request_context():
+    return g.get('profile')
+  return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  elapsed_ms = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+  profile = current_profile()
+  if profile is not None:
+    profile.add_query(statement, elapsed_ms)
+  if profiler.slow_query_ms is not None and elapsed_ms >= profiler.slow_query_ms:
+    logger.warning('slow query %.1f ms%s: %s %r', elapsed_ms,
+                   ' in ' + request.path if has_request_context() else '',
+                   statement, parameters)
+
+
+@event.listens_for(Engine, 'handle_error')
+def handle_error(context):
+  # failed statements never reach after_cursor_execute
+  starts = context.connection.info.get('query_start') if context.connection else None
+  if starts:
+    starts.pop()
+
+
+class TimedTemplate(Template):
+  # render() only runs for the outermost template, includes and extends are rendered
+  # inside it, so the time is not counted twice
+
+  def render(self, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+      return super(TimedTemplate, self).render(*args, **kwargs)
+    finally:
+      profile = current_profile()
+      if profile is not None:
+        profile.render_ms += (time.perf_counter() - start) * 1000
+
+
+# ----------------------------------------------------------------------------#
+# Extension.
+# ----------------------------------------------------------------------------#
+
+
+class Profiler(object):
+  # PROFILE_SLOW_QUERY_MS and PROFILE_SLOW_REQUEST_MS are the thresholds above which
+  # statements and requests are logged to the 'fyyur.profile' logger (None disables
+  # them), PROFILE_SERVER_TIMING adds the Server-Timing header and PROFILE_BUFFER_SIZE
+  # is the number of recent requests kept for endpoint_stats()
+
+  def __init__(self, app=None):
+    self.slow_query_ms = None
+    self.slow_request_ms = None
+    self.server_timing = False
+    self.requests = deque(maxlen=1000)
+    self.lock = threading.Lock()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.slow_query_ms = app.config.get('PROFILE_SLOW_QUERY_MS', 100)
+    self.slow_request_ms = app.config.get('PROFILE_SLOW_REQUEST_MS', 500)
+    self.server_timing = app.config.get('PROFILE_SERVER_TIMING', False)
+    self.requests = deque(maxlen=app.config.get('PROFILE_BUFFER_SIZE', 1000))
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(self.start_request)
+    app.after_request(self.finish_request)
+    app.extensions['profiler'] = self
+
+  def start_request(self):
+    g.profile = RequestProfile()
+
+  def finish_request(self, response):
+    profile = g.pop('profile', None)
+    if profile is None:
+      return response
+    total_ms = (time.perf_counter() - profile.start) * 1000
+    record = dict()
+    record['endpoint'] = '%s %s' % (request.method, request.endpoint)
+    record['status'] = response.status_code
+    record['total_ms'] = total_ms
+    record['db_ms'] = profile.db_ms
+    record['render_ms'] = profile.render_ms
+    record['queries'] = profile.queries
+    record['slowest_ms'] = profile.slowest_ms
+    record['slowest'] = profile.slowest
+    with self.lock:
+      self.requests.append(record)
+
+    if self.slow_request_ms is not None and total_ms >= self.slow_request_ms:
+      logger.warning('slow request %.1f ms: %s %s, %d queries in %.1f ms, render %.1f ms, '
+                     'slowest query %.1f ms: %s', total_ms, request.method,
+                     request.full_path.rstrip('?'), profile.queries, profile.db_ms,
+                     profile.render_ms, profile.slowest_ms, profile.slowest)
+    if self.server_timing:
+      response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d queries"' % (
+          profile.db_ms, profile.queries))
+      response.headers.add('Server-Timing', 'render;dur=%.1f' % profile.render_ms)
+      response.headers.add('Server-Timing', 'total;dur=%.1f' % total_ms)
+    return response
+
+  def endpoint_stats(self):
+    # per endpoint aggregates over the requests in the buffer, slowest p95 first
+    with self.lock:
+      records = list(self.requests)
+    grouped = dict()
+    for record in records:
+      grouped.setdefault(record['endpoint'], []).append(record)
+    stats = []
+    for endpoint, rows in grouped.items():
+      totals = [row['total_ms'] for row in rows]
+      slowest = max(rows, key=lambda row: row['slowest_ms'])
+      item = dict()
+      item['endpoint'] = endpoint
+      item['requests'] = len(rows)
+      item['p50_ms'] = round(percentile(totals, 0.50), 2)
+      item['p95_ms'] = round(percentile(totals, 0.95), 2)
+      item['max_ms'] = round(max(totals), 2)
+      item['mean_db_ms'] = round(sum(row['db_ms'] for row in rows) / len(rows), 2)
+      item['mean_render_ms'] = round(sum(row['render_ms'] for row in rows) / len(rows), 2)
+      item['mean_queries'] = round(sum(row['queries'] for row in rows) / len(rows), 2)
+      item['max_queries'] = max(row['queries'] for row in rows)
+      item['slowest_query_ms'] = round(slowest['slowest_ms'], 2)
+      item['slowest_query'] = slowest['slowest']
+      stats.append(item)
+    return sorted(stats, key=lambda item: item['p95_ms'], reverse=True)
+
+
+profiler = Profiler()
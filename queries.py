@@ -0,0 +1,324 @@
+import base64
+import binascii
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import groupby
+from sqlalchemy import DateTime, func, literal_column, or_, select, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.functions import FunctionElement
+from extensions import db
+from models.models import Artist, Show, Venue
+
+
+# ----------------------------------------------------------------------------#
+# Shows.
+# ----------------------------------------------------------------------------#
+
+
+def utc_now():
+  # show times are stored in utc, every upcoming/past decision compares them with this
+  return datetime.utcnow()
+
+
+def split_shows(shows, now=None):
+  # shows are loaded ordered by start_time, so everything before the first show
+  # starting at or after now is in the past and the rest is upcoming
+  now = now or utc_now()
+  index = bisect_left([show.start_time for show in shows], now)
+  return shows[:index], shows[index:]
+
+
+def upcoming_shows_filter(now=None):
+  # the one definition of an upcoming show used by every count and feed: it starts at
+  # or after now, like the upcoming half of split_shows. past shows start before now
+  return Show.start_time >= (now or utc_now())
+
+
+def parse_datetime(value):
+  # an iso date or datetime from a request, as naive utc like the stored show times.
+  # values with an offset are converted. raises ValueError for anything else
+  value = datetime.fromisoformat(value)
+  if value.tzinfo is not None:
+    value = value.astimezone(timezone.utc).replace(tzinfo=None)
+  return value
+
+
+def encode_cursor(start_time, show_id):
+  # the cursor is the (start_time, id) of the last show on a page, kept opaque to clients
+  value = start_time.isoformat() + '|' + str(show_id)
+  return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+  # raises ValueError for cursors that were not produced by encode_cursor
+  try:
+    start_time, show_id = base64.urlsafe_b64decode(
+        cursor.encode()).decode().split('|')
+    return parse_datetime(start_time), int(show_id)
+  except (TypeError, UnicodeError, binascii.Error) as e:
+    raise ValueError('invalid cursor') from e
+
+
+def window_args(args):
+  # the time window and place filters of a shows request: start and end are iso dates
+  # or datetimes, in utc unless they carry an offset, end excluded, and city, state
+  # and genre match exactly. raises ValueError for bad values
+  window = dict()
+  window['start'] = parse_datetime(args['start']) if args.get('start') else None
+  window['end'] = parse_datetime(args['end']) if args.get('end') else None
+  if window['start'] and window['end'] and window['end'] <= window['start']:
+    raise ValueError('end before start')
+  for name in ('city', 'state', 'genre'):
+    window[name] = args.get(name) or None
+  return window
+
+
+# every query arg of a shows feed request
+SHOW_PAGE_ARGS = ('when', 'cursor', 'per_page', 'start', 'end', 'city', 'state', 'genre')
+
+
+def page_filters(args):
+  # the arguments the next page of a filtered feed carries over, without its cursor
+  return {name: args[name] for name in ('start', 'end', 'city', 'state', 'genre', 'per_page')
+          if args.get(name)}
+
+
+def window_filter(query, start=None, end=None, city=None, state=None, genre=None):
+  # a half-open range on Show.start_time, so the start_time indexes serve any window,
+  # and exact matches on the venue's area and the artist's genres. the query must
+  # join Venue and Artist
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  if end is not None:
+    query = query.filter(Show.start_time < end)
+  if city is not None:
+    query = query.filter(Venue.city == city)
+  if state is not None:
+    query = query.filter(Venue.state == state)
+  if genre is not None:
+    query = query.filter(has_genre(Artist.genres, genre))
+  return query
+
+
+def has_genre(column, genre):
+  # postgres answers @> from the genres gin index, sqlite looks through the json list
+  if db.engine.dialect.name == 'postgresql':
+    return column.contains([genre])
+  values = func.json_each(column).table_valued('value')
+  return select(values.c.value).where(values.c.value == genre).exists()
+
+
+def show_page_args(args, config):
+  # validate the when, cursor, per_page and window arguments of a shows feed request,
+  # raising ValueError for bad values
+  when = args.get('when', 'all')
+  if when not in ('all', 'upcoming', 'past'):
+    raise ValueError('invalid when')
+  per_page = min(args.get('per_page', config['SHOWS_PER_PAGE'], type=int),
+                 config['SHOWS_MAX_PER_PAGE'])
+  if per_page < 1:
+    raise ValueError('invalid per_page')
+  cursor = args.get('cursor')
+  if cursor is not None:
+    decode_cursor(cursor)
+  return when, cursor, per_page, window_args(args)
+
+
+def show_page_query(when='all', cursor=None, per_page=30, now=None, window=None):
+  # keyset pagination on (start_time, id): each page seeks past the cursor instead of
+  # using an offset, so a page costs the same no matter how many shows exist.
+  # past shows are listed most recent first, everything else oldest first
+  now = now or utc_now()
+  query = select(
+      Show.id, Show.start_time, Show.end_time, Show.venue_id, Show.artist_id,
+      Venue.name.label('venue_name'), Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+  ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id)
+  query = window_filter(query, **(window or {}))
+
+  descending = when == 'past'
+  if when == 'upcoming':
+    query = query.filter(upcoming_shows_filter(now))
+  elif when == 'past':
+    query = query.filter(Show.start_time < now)
+
+  if cursor is not None:
+    key = tuple_(Show.start_time, Show.id)
+    last = tuple_(*decode_cursor(cursor))
+    query = query.filter(key < last if descending else key > last)
+
+  if descending:
+    query = query.order_by(Show.start_time.desc(), Show.id.desc())
+  else:
+    query = query.order_by(Show.start_time, Show.id)
+
+  # fetch one extra row to find out whether there is a next page
+  return query.limit(per_page + 1)
+
+
+def show_page_result(rows, per_page):
+  shows = rows[:per_page]
+  next_cursor = None
+  if len(rows) > per_page:
+    next_cursor = encode_cursor(shows[-1].start_time, shows[-1].id)
+  return shows, next_cursor
+
+
+def show_page(when='all', cursor=None, per_page=30, now=None, window=None):
+  rows = db.session.execute(show_page_query(when, cursor, per_page, now, window)).all()
+  return show_page_result(rows, per_page)
+
+
+# ----------------------------------------------------------------------------#
+# Bookings.
+# ----------------------------------------------------------------------------#
+
+
+def booking_conflicts(column, id, start, end):
+  # the shows of one venue or artist (column is Show.venue_id or Show.artist_id) that
+  # overlap [start, end). postgres answers from the exclusion constraint's gist index,
+  # other databases from the (column, start_time) index
+  query = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time,
+                           Show.end_time).filter(column == id)
+  if db.engine.dialect.name == 'postgresql':
+    query = query.filter(func.tsrange(Show.start_time, Show.end_time).op('&&')(
+        func.tsrange(start, end)))
+  else:
+    query = query.filter(Show.start_time < end, Show.end_time > start)
+  return query.order_by(Show.start_time).all()
+
+
+def batch_bookings(venue_ids, artist_ids, start, end):
+  # the shows of any of the venues or artists that overlap [start, end), in one query,
+  # so a batch of new shows is checked against the stored ones in memory
+  query = db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+  return query.filter(or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)),
+                      Show.start_time < end, Show.end_time > start).all()
+
+
+# ----------------------------------------------------------------------------#
+# Calendar.
+# ----------------------------------------------------------------------------#
+
+
+class date_trunc(FunctionElement):
+  # date_trunc('day' | 'week', column): the start of the day or of the (monday) week
+  type = DateTime()
+  name = 'date_trunc'
+  inherit_cache = True
+
+  def __init__(self, unit, column):
+    super(date_trunc, self).__init__(literal_column("'%s'" % unit), column)
+
+
+@compiles(date_trunc)
+def compile_date_trunc(element, compiler, **kw):
+  return 'date_trunc(%s)' % compiler.process(element.clauses, **kw)
+
+
+@compiles(date_trunc, 'sqlite')
+def compile_date_trunc_sqlite(element, compiler, **kw):
+  unit, column = element.clauses.clauses
+  modifiers = "'start of day'"
+  if unit.name == "'week'":
+    # back six days, then forward to the next monday, which may be the same day
+    modifiers += ", '-6 days', 'weekday 1'"
+  return 'datetime(%s, %s)' % (compiler.process(column, **kw), modifiers)
+
+
+CALENDAR_UNITS = ('day', 'week')
+
+
+def calendar_args(args, config):
+  # per (day or week), by (nothing or venue) and a window of at most CALENDAR_MAX_DAYS
+  # with both start and end, raising ValueError for bad values
+  per = args.get('per', 'day')
+  by = args.get('by')
+  if per not in CALENDAR_UNITS or by not in (None, 'venue'):
+    raise ValueError('invalid per or by')
+  window = window_args(args)
+  if window['start'] is None or window['end'] is None:
+    raise ValueError('start and end are required')
+  if (window['end'] - window['start']).days > config['CALENDAR_MAX_DAYS']:
+    raise ValueError('window too long')
+  return per, by, window
+
+
+def show_counts(per='day', by=None, window=None):
+  # number of shows per day or week in the window, optionally per venue too, grouped
+  # in the database
+  period = date_trunc(per, Show.start_time).label('period')
+  columns = [period]
+  if by == 'venue':
+    columns += [Venue.id.label('venue_id'), Venue.name.label('venue_name')]
+  query = select(*columns + [func.count(Show.id).label('shows')]).select_from(Show).join(
+      Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id)
+  query = window_filter(query, **(window or {}))
+  return db.session.execute(query.group_by(*columns).order_by(*columns)).all()
+
+
+# ----------------------------------------------------------------------------#
+# Venues.
+# ----------------------------------------------------------------------------#
+
+
+def area_list():
+  # every (city, state) pair with at least one venue, in listing order
+  return db.session.query(Venue.city, Venue.state).group_by(
+      Venue.state, Venue.city).order_by(Venue.state, Venue.city).all()
+
+
+def venue_listing(areas=None):
+  # every venue with its stored upcoming show count ordered by area, optionally
+  # limited to some (city, state) areas
+  query = db.session.query(
+      Venue.city, Venue.state, Venue.id, Venue.name,
+      Venue.upcoming_shows_count.label('num_upcoming_shows'))
+  if areas is not None:
+    query = query.filter(tuple_(Venue.city, Venue.state).in_(
+        [tuple(area) for area in areas]))
+  return query.order_by(Venue.state, Venue.city, Venue.id)
+
+
+def venue_areas(areas=None):
+  # build the city/state -> venues -> num_upcoming_shows tree from one query over Venue
+  rows = venue_listing(areas).all()
+
+  # rows come back ordered by area, so group consecutive rows by (city, state)
+  areas = []
+  for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+    obj = dict()
+    obj['city'] = city
+    obj['state'] = state
+    obj['venues'] = [
+        {'id': venue.id, 'name': venue.name,
+         'num_upcoming_shows': venue.num_upcoming_shows}
+        for venue in venues
+    ]
+    areas.append(obj)
+
+  return areas
+
+
+def venue_detail(venue_id):
+  # load the venue, its shows and each show's artist in one joined query
+  return db.session.query(Venue).options(
+      joinedload(Venue.shows).joinedload(Show.artist_shows)
+  ).filter(Venue.id == venue_id).one_or_none()
+
+
+# ----------------------------------------------------------------------------#
+# Artists.
+# ----------------------------------------------------------------------------#
+
+
+def artist_listing():
+  return db.session.query(Artist.id, Artist.name).order_by(Artist.id)
+
+
+def artist_detail(artist_id):
+  # load the artist, its shows and each show's venue in one joined query
+  return db.session.query(Artist).options(
+      joinedload(Artist.shows).joinedload(Show.venue_shows)
+  ).filter(Artist.id == artist_id).one_or_none()
@@ -0,0 +1,83 @@
+import random
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import create_engine, event, orm
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+
+# ----------------------------------------------------------------------------#
+# Routing.
+# ----------------------------------------------------------------------------#
+
+# views decorated with read_only send their queries to one of the
+# SQLALCHEMY_REPLICA_URIS, picked per request. everything else goes to the primary:
+# other views, commands, flushes and insert/update/delete statements, every statement
+# after the first write of a transaction, and every request of a user during the
+# REPLICA_STICKY_SECONDS after their last write, so users read their own writes
+
+
+def read_only(view):
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    g.read_only = True
+    return current_app.ensure_sync(view)(*args, **kwargs)
+  return wrapper
+
+
+def replica_engine():
+  # the replica engine for the current request, None when it has to use the primary
+  if not has_request_context() or not g.get('read_only'):
+    return None
+  engines = current_app.extensions.get('replicas')
+  if not engines or session.get('primary_until', 0) > time.time():
+    return None
+  if 'replica' not in g:
+    g.replica = random.choice(engines)
+  return g.replica
+
+
+class RoutingSession(SignallingSession):
+
+  def get_bind(self, mapper=None, clause=None):
+    if self._flushing or isinstance(clause, UpdateBase):
+      self.info['wrote'] = True
+    elif not self.info.get('wrote'):
+      engine = replica_engine()
+      if engine is not None:
+        return engine
+    return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+@event.listens_for(Session, 'after_commit')
+def stick_to_primary(db_session):
+  if db_session.info.pop('wrote', False) and has_request_context():
+    seconds = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+    session['primary_until'] = time.time() + seconds
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_writes(db_session):
+  db_session.info.pop('wrote', None)
+
+
+# ----------------------------------------------------------------------------#
+# Extension.
+# ----------------------------------------------------------------------------#
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  # SQLALCHEMY_REPLICA_URIS lists the replicas, they are created with the primary's
+  # SQLALCHEMY_ENGINE_OPTIONS
+
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+  def init_app(self, app):
+    super(RoutingSQLAlchemy, self).init_app(app)
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    app.extensions['replicas'] = [
+        create_engine(uri, **options)
+        for uri in app.config.get('SQLALCHEMY_REPLICA_URIS') or []]
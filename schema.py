@@ -0,0 +1,52 @@
+import logging
+import os
+from extensions import db
+
+logger = logging.getLogger('fyyur.schema')
+
+
+# ----------------------------------------------------------------------------#
+# Schema check.
+# ----------------------------------------------------------------------------#
+
+# servers check on startup that the database was migrated to the latest revision and
+# that the models match it, before serving requests from a schema the code doesn't
+# expect. SCHEMA_CHECK is 'warn' to log the differences, 'error' to refuse to start or
+# 'off'. the flask commands skip the check, `flask db upgrade` has to run on an old
+# schema and `flask fyyur check-schema` runs it on demand. alembic is only imported
+# when the check runs
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def schema_problems():
+  # descriptions of every difference, empty when the schema is up to date. needs an
+  # app context
+  from alembic.autogenerate import compare_metadata
+  from alembic.migration import MigrationContext
+  from alembic.script import ScriptDirectory
+  heads = set(ScriptDirectory(MIGRATIONS).get_heads())
+  with db.engine.connect() as connection:
+    context = MigrationContext.configure(connection, opts={'compare_type': True})
+    current = set(context.get_current_heads())
+    differences = compare_metadata(context, db.metadata)
+  problems = []
+  if current != heads:
+    problems.append('database revision %s, migrations head %s' % (
+        ', '.join(sorted(current)) or 'none', ', '.join(sorted(heads))))
+  problems.extend('models differ from the database: %r' % (difference,)
+                  for difference in differences)
+  return problems
+
+
+def check_schema(app):
+  mode = app.config['SCHEMA_CHECK']
+  if mode == 'off':
+    return
+  with app.app_context():
+    problems = schema_problems()
+  for problem in problems:
+    logger.warning(problem)
+  if problems and mode == 'error':
+    raise RuntimeError('schema check failed, run `flask db upgrade` or add a migration: ' +
+                       '; '.join(problems))
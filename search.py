@@ -0,0 +1,369 @@
+import gc
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict, namedtuple
+from itertools import chain, groupby, islice
+from operator import itemgetter
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_session
+from extensions import db
+from models.models import Artist, Venue
+
+
+# ----------------------------------------------------------------------------#
+# Search.
+# ----------------------------------------------------------------------------#
+
+# postgres searches through the pg_trgm GIN indexes on the name columns and the GIN
+# indexes on the genres arrays, any other database (sqlite test runs) searches an
+# in-process trigram index of the names and filters the matches' genres in python
+
+
+def search(model, term, limit=50, genre=None):
+  # return up to limit (id, name) rows whose name contains term, and that list genre
+  # when one is given, best matches first
+  term = term.strip()
+  if db.engine.dialect.name == 'postgresql':
+    return search_sql(model, term, limit, genre)
+  if genre is None:
+    return name_index(model).search(term, limit)
+  genres = match_genres(model, term)
+  return [result for result in name_index(model).search(term, len(genres))
+          if genre in (genres.get(result.id) or ())][:limit]
+
+
+def search_sql(model, term, limit, genre=None):
+  # ilike can use the gin_trgm_ops index and @> the genres index, word_similarity
+  # ranks the matches
+  rank = func.word_similarity(term, model.name)
+  query = db.session.query(model.id, model.name).filter(name_filter(model, term))
+  if genre is not None:
+    query = query.filter(model.genres.contains([genre]))
+  return query.order_by(rank.desc(), model.name, model.id).limit(limit).all()
+
+
+def name_filter(model, term):
+  return model.name.ilike('%' + escape_like(term) + '%', escape='/')
+
+
+def escape_like(term):
+  return term.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+# ----------------------------------------------------------------------------#
+# Facets.
+# ----------------------------------------------------------------------------#
+
+
+GenreCount = namedtuple('GenreCount', ['genre', 'count'])
+
+
+def genre_counts(model, term):
+  # (genre, count) for every genre listed by the rows whose name contains term, most
+  # listed first. counts ignore any genre filter of the search, so they tell how many
+  # results picking each genre gives
+  term = term.strip()
+  if db.engine.dialect.name == 'postgresql':
+    return genre_counts_sql(model, term)
+  counts = Counter(genre for genres in match_genres(model, term).values()
+                   for genre in set(genres or ()))
+  return [GenreCount(genre, count) for genre, count in
+          sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+
+
+def genre_counts_sql(model, term):
+  # one query: unnest the matches' genres and group them
+  listed = db.session.query(model.id, func.unnest(model.genres).label('genre')).filter(
+      name_filter(model, term)).subquery()
+  count = func.count(listed.c.id.distinct()).label('count')
+  return db.session.query(listed.c.genre, count).group_by(
+      listed.c.genre).order_by(count.desc(), listed.c.genre).all()
+
+
+def match_genres(model, term):
+  # {id: genres} of every row whose name contains term, through the in-process index
+  ids = [result.id for result in name_index(model).search(term, len(name_index(model).names))]
+  genres = {}
+  for start in range(0, len(ids), 500):
+    genres.update(db.session.query(model.id, model.genres).filter(
+        model.id.in_(ids[start:start + 500])))
+  return genres
+
+
+# ----------------------------------------------------------------------------#
+# In-process index.
+# ----------------------------------------------------------------------------#
+
+
+SearchResult = namedtuple('SearchResult', ['id', 'name'])
+
+
+def grams(value):
+  # the one, two and three character substrings of value
+  return {value[i:i + n] for n in (1, 2, 3) for i in range(len(value) - n + 1)}
+
+
+class SortedKeys(object):
+  # a sorted list kept in chunks of about CHUNK keys, so an insert or a delete moves
+  # one chunk instead of a list as long as the index. iterates in order
+
+  CHUNK = 1000
+
+  def __init__(self, keys=()):
+    # keys are given sorted
+    self.chunks = [keys[i:i + self.CHUNK] for i in range(0, len(keys), self.CHUNK)]
+    self.maxes = [chunk[-1] for chunk in self.chunks]
+    self.size = len(keys)
+
+  def __len__(self):
+    return self.size
+
+  def __iter__(self):
+    return chain.from_iterable(self.chunks)
+
+  def add(self, key):
+    index = min(bisect_left(self.maxes, key), len(self.chunks) - 1)
+    if index < 0:
+      self.chunks.append([key])
+      self.maxes.append(key)
+    else:
+      chunk = self.chunks[index]
+      insort(chunk, key)
+      self.maxes[index] = chunk[-1]
+      if len(chunk) > 2 * self.CHUNK:
+        self.chunks[index:index + 1] = [chunk[:self.CHUNK], chunk[self.CHUNK:]]
+        self.maxes[index:index + 1] = [chunk[self.CHUNK - 1], chunk[-1]]
+    self.size += 1
+
+  def discard(self, key):
+    index = bisect_left(self.maxes, key)
+    if index == len(self.chunks):
+      return
+    chunk = self.chunks[index]
+    position = bisect_left(chunk, key)
+    if chunk[position] != key:
+      return
+    del chunk[position]
+    if chunk:
+      self.maxes[index] = chunk[-1]
+    else:
+      del self.chunks[index]
+      del self.maxes[index]
+    self.size -= 1
+
+
+class NameIndex(object):
+  # matches rank prefix matches first, then names the term covers most of, i.e. by
+  # (not a prefix match, len(name), name, id). every list below is kept in that rank
+  # order: the names, the names per one, two and three character prefix, and the
+  # names containing each one, two and three character gram. a search walks the
+  # shortest list that holds all the matches (the term's own prefix and gram lists
+  # up to three characters, else the rarest of its trigrams), and stops once the
+  # limit is filled, so it reads about limit entries instead of every match.
+  # the index is shared by the request threads and the async views' loop thread and
+  # changed by after_commit hooks, so searches and changes hold its lock
+
+  def __init__(self, rows=()):
+    self.lock = threading.Lock()
+    self.names = {}
+    # the bulk load creates no reference cycles, but its allocations would start full
+    # collections, each walking every list built so far
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+      self.load(rows)
+    finally:
+      if collecting:
+        gc.enable()
+
+  def load(self, rows):
+    # in rank order, so every list is appended to in order
+    keys = []
+    for id, name in rows:
+      if name is not None:
+        lowered = name.lower()
+        key = (len(lowered), lowered, id)
+        self.names[id] = (name, key)
+        keys.append(key)
+    keys.sort()
+    # the keys of one lowered name are next to each other in rank order, and share
+    # their prefixes and grams
+    prefix_lists = defaultdict(list)
+    gram_lists = defaultdict(list)
+    for lowered, run in groupby(keys, key=itemgetter(1)):
+      run = list(run)
+      for prefix in prefixes(lowered):
+        prefix_lists[prefix].extend(run)
+      for gram in grams(lowered):
+        gram_lists[gram].extend(run)
+    self.ordered = SortedKeys(keys)
+    self.prefixes = {prefix: SortedKeys(keys) for prefix, keys in prefix_lists.items()}
+    self.postings = {gram: SortedKeys(keys) for gram, keys in gram_lists.items()}
+
+  def add(self, id, name):
+    with self.lock:
+      self.unindex(id)
+      if name is None:
+        return
+      lowered = name.lower()
+      key = (len(lowered), lowered, id)
+      self.names[id] = (name, key)
+      self.ordered.add(key)
+      for prefix in prefixes(lowered):
+        self.prefixes.setdefault(prefix, SortedKeys()).add(key)
+      for gram in grams(lowered):
+        self.postings.setdefault(gram, SortedKeys()).add(key)
+
+  def remove(self, id):
+    with self.lock:
+      self.unindex(id)
+
+  def unindex(self, id):
+    entry = self.names.pop(id, None)
+    if entry is None:
+      return
+    key = entry[1]
+    self.ordered.discard(key)
+    for lists, values in ((self.prefixes, prefixes(key[1])), (self.postings, grams(key[1]))):
+      for value in values:
+        keys = lists[value]
+        keys.discard(key)
+        if not keys:
+          del lists[value]
+
+  def search(self, term, limit):
+    needle = term.lower()
+    with self.lock:
+      if not needle:
+        keys = list(islice(self.ordered, limit))
+      else:
+        keys = self.search_prefix(needle, limit)
+        if len(keys) < limit:
+          keys += self.search_inside(needle, limit - len(keys))
+      return [SearchResult(key[2], self.names[key[2]][0]) for key in keys]
+
+  def containing(self, needle):
+    # a rank ordered list holding every name that contains needle
+    if len(needle) <= 3:
+      return self.postings.get(needle, ())
+    return min((self.postings.get(gram, ()) for gram in trigrams(needle)), key=len)
+
+  def search_prefix(self, needle, limit):
+    keys = self.prefixes.get(needle[:3], ())
+    if len(needle) <= 3:
+      return list(islice(keys, limit))
+    keys = min(keys, self.containing(needle), key=len)
+    return list(islice((key for key in keys if key[1].startswith(needle)), limit))
+
+  def search_inside(self, needle, limit):
+    return list(islice((key for key in self.containing(needle)
+                        if needle in key[1] and not key[1].startswith(needle)), limit))
+
+
+def prefixes(value):
+  return {value[:n] for n in (1, 2, 3) if len(value) >= n}
+
+
+def trigrams(value):
+  return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+# the built indexes, and the changes committed while an index is being built, by
+# (database url, model). the lock guards both dicts, never a build
+name_indexes = {}
+pending_changes = {}
+name_indexes_lock = threading.Lock()
+build_locks = defaultdict(threading.Lock)
+
+
+def name_index(model):
+  # built from the table once, when the servers start (see build_name_indexes) or on
+  # the first search, then kept in sync by the session hooks below. only searches of
+  # the same index wait for its build. changes committed during the build are applied
+  # to the index before it is used
+  key = (str(db.engine.url), model)
+  index = name_indexes.get(key)
+  if index is not None:
+    return index
+  with name_indexes_lock:
+    build_lock = build_locks[key]
+  with build_lock:
+    if key in name_indexes:
+      return name_indexes[key]
+    with name_indexes_lock:
+      pending_changes[key] = []
+    try:
+      index = NameIndex(db.session.query(model.id, model.name).yield_per(10000))
+    except BaseException:
+      with name_indexes_lock:
+        del pending_changes[key]
+      raise
+    with name_indexes_lock:
+      for id, name in pending_changes.pop(key):
+        index.add(id, name)
+      name_indexes[key] = index
+    return index
+
+
+def build_name_indexes(app):
+  # with WARM_UP servers build the indexes before they take traffic, so no search waits
+  # for a build. postgres searches its own indexes
+  if not app.config.get('WARM_UP'):
+    return
+  with app.app_context():
+    if db.engine.dialect.name != 'postgresql':
+      for model in (Venue, Artist):
+        name_index(model)
+    db.session.remove()
+
+
+def record_name_deletes(session, model, ids):
+  # set-based deletes bypass the mapper events, so they report their ids here and the
+  # index drops them once the transaction commits
+  session.info.setdefault('name_changes', []).extend(
+      (model, id, None) for id in ids)
+
+
+def record_name_update(session, model, id, name):
+  # same for set-based updates
+  session.info.setdefault('name_changes', []).append((model, id, name))
+
+
+def record_name_change(mapper, connection, target):
+  session = object_session(target)
+  if session is not None:
+    session.info.setdefault('name_changes', []).append(
+        (type(target), target.id, target.name))
+
+
+def record_name_delete(mapper, connection, target):
+  session = object_session(target)
+  if session is not None:
+    session.info.setdefault('name_changes', []).append(
+        (type(target), target.id, None))
+
+
+for _model in (Venue, Artist):
+  event.listen(_model, 'after_insert', record_name_change)
+  event.listen(_model, 'after_update', record_name_change)
+  event.listen(_model, 'after_delete', record_name_delete)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_name_changes(session):
+  changes = session.info.pop('name_changes', [])
+  if not changes or not (name_indexes or pending_changes):
+    return
+  url = str(session.get_bind().url)
+  with name_indexes_lock:
+    for model, id, name in changes:
+      key = (url, model)
+      if key in pending_changes:
+        pending_changes[key].append((id, name))
+      elif key in name_indexes:
+        name_indexes[key].add(id, name)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def discard_name_changes(session, previous_transaction):
+  session.info.pop('name_changes', None)
@@ -0,0 +1,139 @@
+from queries import split_shows
+
+
+# ----------------------------------------------------------------------------#
+# Serializers.
+# ----------------------------------------------------------------------------#
+
+# dicts shared by the html pages and the json api. datetimes are left as datetime
+# objects, the templates format them and the api encodes them as iso 8601
+
+
+def venue_show(show):
+  obj = dict()
+  obj['artist_id'] = show.artist_id
+  obj['artist_name'] = show.artist_shows.name
+  obj['artist_image_link'] = show.artist_shows.image_link
+  obj['start_time'] = show.start_time
+  obj['end_time'] = show.end_time
+  return obj
+
+
+def artist_show(show):
+  obj = dict()
+  obj['venue_id'] = show.venue_id
+  obj['venue_name'] = show.venue_shows.name
+  obj['venue_image_link'] = show.venue_shows.image_link
+  obj['start_time'] = show.start_time
+  obj['end_time'] = show.end_time
+  return obj
+
+
+def venue_data(venue, shows=None):
+  # split the start_time ordered shows into past and upcoming, then form the response.
+  # shows loaded apart from the venue are passed in start_time order
+  past, upcoming = split_shows(venue.shows if shows is None else shows)
+  past_shows = [venue_show(show) for show in past]
+  upcoming_shows = [venue_show(show) for show in upcoming]
+
+  data = dict()
+  data['id'] = venue.id
+  data['name'] = venue.name
+  data['genres'] = venue.genres
+  data['address'] = venue.address
+  data['city'] = venue.city
+  data['state'] = venue.state
+  data['phone'] = venue.phone
+  data['website'] = venue.website_link
+  data['facebook_link'] = venue.facebook_link
+  data['seeking_talent'] = venue.seeking_talent
+  data['seeking_description'] = venue.seeking_description
+  data['image_link'] = venue.image_link
+  data['past_shows'] = past_shows
+  data['upcoming_shows'] = upcoming_shows
+  data['past_shows_count'] = len(past_shows)
+  data['upcoming_shows_count'] = len(upcoming_shows)
+  return data
+
+
+def artist_data(artist, shows=None):
+  # split the start_time ordered shows into past and upcoming, then form the response.
+  # shows loaded apart from the artist are passed in start_time order
+  past, upcoming = split_shows(artist.shows if shows is None else shows)
+  past_shows = [artist_show(show) for show in past]
+  upcoming_shows = [artist_show(show) for show in upcoming]
+
+  data = dict()
+  data['id'] = artist.id
+  data['name'] = artist.name
+  data['genres'] = artist.genres
+  data['city'] = artist.city
+  data['state'] = artist.state
+  data['phone'] = artist.phone
+  data['website'] = artist.website_link
+  data['facebook_link'] = artist.facebook_link
+  data['seeking_venue'] = artist.seeking_venues
+  data['seeking_description'] = artist.seeking_description
+  data['image_link'] = artist.image_link
+  data['past_shows'] = past_shows
+  data['upcoming_shows'] = upcoming_shows
+  data['past_shows_count'] = len(past_shows)
+  data['upcoming_shows_count'] = len(upcoming_shows)
+  return data
+
+
+def venue_listing_item(row):
+  obj = dict()
+  obj['id'] = row.id
+  obj['name'] = row.name
+  obj['city'] = row.city
+  obj['state'] = row.state
+  obj['num_upcoming_shows'] = row.num_upcoming_shows
+  return obj
+
+
+def artist_listing_item(row):
+  obj = dict()
+  obj['id'] = row.id
+  obj['name'] = row.name
+  return obj
+
+
+def show_item(row):
+  obj = dict()
+  obj['id'] = row.id
+  obj['venue_id'] = row.venue_id
+  obj['venue_name'] = row.venue_name
+  obj['artist_id'] = row.artist_id
+  obj['artist_name'] = row.artist_name
+  obj['artist_image_link'] = row.artist_image_link
+  obj['start_time'] = row.start_time
+  obj['end_time'] = row.end_time
+  return obj
+
+
+def booking_item(row):
+  obj = dict()
+  obj['id'] = row.id
+  obj['venue_id'] = row.venue_id
+  obj['artist_id'] = row.artist_id
+  obj['start_time'] = row.start_time
+  obj['end_time'] = row.end_time
+  return obj
+
+
+def search_response(results, counts, genres=None):
+  # genres are the (genre, count) facets of the search, when asked for
+  response = {
+      "count": len(results),
+      "data": []
+  }
+  if genres is not None:
+    response['genres'] = [{'genre': row.genre, 'count': row.count} for row in genres]
+  for result in results:
+    obj = dict()
+    obj['id'] = result.id
+    obj['name'] = result.name
+    obj['num_upcoming_shows'] = counts[result.id]
+    response['data'].append(obj)
+  return response
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+
+
+# ----------------------------------------------------------------------------#
+# Bytecode cache.
+# ----------------------------------------------------------------------------#
+
+# templates are compiled to python bytecode once per host instead of once per worker:
+# the bytecode is kept in TEMPLATE_CACHE_DIR, shared by every worker, and can be filled
+# before the servers start with `flask fyyur compile-templates`. jinja checks every
+# entry against its template's source, so an edited template is compiled again
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+  # written to a temporary file and renamed into place, so a worker never loads the
+  # half written bytecode of another. readable by all like jinja's own files, the cache
+  # may be filled by another user than the servers run as
+
+  def dump_bytecode(self, bucket):
+    fd, path = tempfile.mkstemp(prefix='.tmp-', dir=self.directory)
+    try:
+      with os.fdopen(fd, 'wb') as file:
+        bucket.write_bytecode(file)
+      os.chmod(path, 0o644)
+      os.replace(path, self._get_cache_filename(bucket))
+    except Exception:
+      os.remove(path)
+      raise
+
+
+def init_templates(app):
+  # has to run before anything creates app.jinja_env, which reads jinja_options once.
+  # TEMPLATES_AUTO_RELOAD is applied by flask when it creates the environment
+  directory = app.config.get('TEMPLATE_CACHE_DIR')
+  if not directory:
+    return
+  try:
+    os.makedirs(directory, exist_ok=True)
+  except OSError as e:
+    app.logger.warning('template bytecode cache disabled: %s', e)
+    return
+  app.jinja_options = dict(app.jinja_options, bytecode_cache=SharedBytecodeCache(directory))
+
+
+def compile_templates(app):
+  # every html template, loaded into the environment's template cache and, with
+  # TEMPLATE_CACHE_DIR, the bytecode cache. returns their names
+  names = app.jinja_env.list_templates(extensions=['html'])
+  for name in names:
+    app.jinja_env.get_template(name)
+  return names
+
+
+# ----------------------------------------------------------------------------#
+# Warm up.
+# ----------------------------------------------------------------------------#
+
+# with WARM_UP, servers render every page once with the fixture data below before they
+# take traffic, so the first requests after a deploy don't pay for compiling templates,
+# importing the forms and babel, loading locale data or building the url adapter.
+# gunicorn (preload_app) and uwsgi load the app before forking, so every worker
+# inherits the warm app. no query is run and nothing is cached
+
+START_TIME = datetime(2026, 1, 1, 20)
+
+
+def fixture_show():
+  show = dict()
+  show['id'] = 1
+  show['venue_id'] = 1
+  show['venue_name'] = 'Fixture Hall'
+  show['venue_image_link'] = ''
+  show['artist_id'] = 1
+  show['artist_name'] = 'Fixture Band'
+  show['artist_image_link'] = ''
+  show['start_time'] = START_TIME
+  show['end_time'] = START_TIME + timedelta(hours=2)
+  return show
+
+
+def fixture_profile(name):
+  # the fields venue_data and artist_data have in common
+  data = dict()
+  data['id'] = 1
+  data['name'] = name
+  data['genres'] = ['Jazz']
+  data['address'] = '1 Fixture Street'
+  data['city'] = 'San Francisco'
+  data['state'] = 'CA'
+  data['phone'] = '123-123-1234'
+  data['website'] = 'https://example.com'
+  data['facebook_link'] = 'https://www.facebook.com/fixture'
+  data['seeking_talent'] = data['seeking_venue'] = True
+  data['seeking_description'] = 'Fixture description.'
+  data['image_link'] = ''
+  data['past_shows'] = data['upcoming_shows'] = [fixture_show()]
+  data['past_shows_count'] = data['upcoming_shows_count'] = 1
+  return data
+
+
+def fixture_pages():
+  # (path, template, context) of every page. the context is a function, the forms have
+  # to be created in the request context
+  from forms import ArtistForm, ShowForm, VenueForm
+  venue = fixture_profile('Fixture Hall')
+  artist = fixture_profile('Fixture Band')
+  item = {'id': 1, 'name': 'Fixture Hall', 'num_upcoming_shows': 1}
+  results = {'count': 1, 'data': [item]}
+  area = {'city': 'San Francisco', 'state': 'CA', 'venues': [item]}
+  return [
+      ('/', 'pages/home.html', dict),
+      ('/venues', 'fragments/venue_area.html', lambda: {'area': area}),
+      ('/venues', 'pages/venues.html', lambda: {'areas': ['']}),
+      ('/venues/search', 'pages/search_venues.html',
+       lambda: {'results': results, 'search_term': 'fixture'}),
+      ('/venues/1', 'pages/show_venue.html', lambda: {'venue': venue}),
+      ('/artists', 'pages/artists.html', lambda: {'artists': [item]}),
+      ('/artists/search', 'pages/search_artists.html',
+       lambda: {'results': results, 'search_term': 'fixture'}),
+      ('/artists/1', 'pages/show_artist.html', lambda: {'artist': artist}),
+      ('/shows', 'pages/shows.html', lambda: {
+          'shows': [fixture_show()], 'when': 'upcoming', 'next_cursor': 'fixture',
+          'filters': {}}),
+      ('/venues/create', 'forms/new_venue.html', lambda: {'form': VenueForm()}),
+      ('/venues/1/edit', 'forms/edit_venue.html',
+       lambda: {'form': VenueForm(), 'venue': venue}),
+      ('/artists/create', 'forms/new_artist.html', lambda: {'form': ArtistForm()}),
+      ('/artists/1/edit', 'forms/edit_artist.html',
+       lambda: {'form': ArtistForm(), 'artist': artist}),
+      ('/shows/create', 'forms/new_show.html', lambda: {'form': ShowForm()}),
+      ('/', 'errors/404.html', dict),
+      ('/', 'errors/500.html', dict),
+  ]
+
+
+def warm_up(app):
+  # a page that fails to render is logged, the server still starts. returns the
+  # number of pages rendered
+  if not app.config.get('WARM_UP'):
+    return 0
+  start = time.perf_counter()
+  names = compile_templates(app)
+  rendered = 0
+  for path, template, context in fixture_pages():
+    with app.test_request_context(path):
+      try:
+        render_template(template, **context())
+      except Exception:
+        app.logger.exception('warm up: rendering %s failed', template)
+      else:
+        rendered += 1
+  app.logger.info('warm up: compiled %d templates and rendered %d pages in %.0f ms',
+                  len(names), rendered, (time.perf_counter() - start) * 1000)
+  return rendered
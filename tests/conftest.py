@@ -0,0 +1,22 @@
+import pytest
+from app import create_app
+from extensions import db
+from search import name_indexes
+
+
+@pytest.fixture
+def app():
+  # the testing profile: an in-memory sqlite database and no page cache
+  app = create_app('testing', cli=False)
+  with app.app_context():
+    db.create_all()
+    yield app
+    db.session.remove()
+    db.drop_all()
+  # every test database has the same url
+  name_indexes.clear()
+
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
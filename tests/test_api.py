@@ -0,0 +1,47 @@
+from cache import LRUCache, cache
+from extensions import db
+from models.models import Venue
+
+
+def add_venue(name='Blue Hall'):
+  venue = Venue(name=name, city='Austin', state='TX', genres=['Jazz'])
+  db.session.add(venue)
+  db.session.commit()
+  return venue.id
+
+
+def edit_venue(client, venue_id, name):
+  client.post('/venues/%d/edit' % venue_id, data={
+      'name': name, 'city': 'Austin', 'state': 'TX', 'genres': ['Jazz']})
+
+
+def test_etag_follows_the_data(client):
+  # the testing profile has no cache, etags must still change with every write
+  venue_id = add_venue()
+  url = '/api/v1/venues/%d' % venue_id
+  first = client.get(url)
+  etag = first.headers['ETag']
+  unchanged = client.get(url, headers={'If-None-Match': etag})
+  assert unchanged.status_code == 304 and unchanged.get_data() == b''
+
+  edit_venue(client, venue_id, 'Green Hall')
+  changed = client.get(url, headers={'If-None-Match': etag})
+  assert changed.status_code == 200
+  assert changed.get_json()['name'] == 'Green Hall'
+  assert changed.headers['ETag'] != etag
+
+
+def test_streamed_collections_have_etags_only_with_a_shared_cache(app, client):
+  add_venue()
+  assert 'ETag' not in client.get('/api/v1/venues').headers
+
+  backend = LRUCache()
+  backend.shared = True
+  cache.backend = backend
+  etag = client.get('/api/v1/venues').headers['ETag']
+  assert client.get('/api/v1/venues', headers={'If-None-Match': etag}).status_code == 304
+  venue_id = add_venue('Green Hall')
+  edit_venue(client, venue_id, 'Red Hall')
+  response = client.get('/api/v1/venues', headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert [venue['name'] for venue in response.get_json()] == ['Blue Hall', 'Red Hall']
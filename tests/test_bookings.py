@@ -0,0 +1,131 @@
+import io
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from bulk import import_rows
+from extensions import db
+from models.models import Artist, Show, Venue
+from queries import batch_bookings, booking_conflicts
+
+
+def add_show(start_time, end_time=None):
+  venue = Venue(name='Blue Hall', city='Austin', state='TX')
+  artist = Artist(name='Blue Band', city='Austin', state='TX')
+  db.session.add(Show(venue_shows=venue, artist_shows=artist, start_time=start_time,
+                      end_time=end_time))
+  db.session.commit()
+  return venue.id, artist.id
+
+
+def test_availability_lists_the_shows_in_the_way(client):
+  venue_id, artist_id = add_show(datetime(2025, 1, 1, 20), datetime(2025, 1, 1, 22))
+  busy = client.get('/api/v1/venues/%d/availability?start=2025-01-01T21:00:00'
+                    '&end=2025-01-01T23:00:00' % venue_id).get_json()
+  assert busy['available'] is False and len(busy['conflicts']) == 1
+  # back to back shows don't overlap, and offsets are read as utc
+  free = client.get('/api/v1/artists/%d/availability?start=2025-01-01T23:00:00%%2B01:00'
+                    '&end=2025-01-02T01:00:00%%2B01:00' % artist_id).get_json()
+  assert free['available'] is True and free['conflicts'] == []
+
+
+def test_availability_rejects_unknown_ids_and_bad_times(client):
+  venue_id, artist_id = add_show(datetime(2025, 1, 1, 20))
+  window = 'start=2025-01-01T21:00:00&end=2025-01-01T23:00:00'
+  assert client.get('/api/v1/venues/%d/availability?%s' % (venue_id + 1, window)).status_code == 404
+  assert client.get('/api/v1/artists/%d/availability?%s' % (artist_id + 1, window)).status_code == 404
+  for query in ('start=2025-01-01T21:00:00', 'start=soon&end=later',
+                'start=2025-01-01T21:00:00&end=2025-01-01T21:00:00',
+                'start=2025-01-01T21:00:00%2B00:00&end=2025-01-01T22:00:00%2B02:00'):
+    response = client.get('/api/v1/venues/%d/availability?%s' % (venue_id, query))
+    assert response.status_code == 400, query
+
+
+def post_show(client, venue_id, artist_id, start_time, end_time=''):
+  return client.post('/shows/create', data={
+      'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time,
+      'end_time': end_time}).get_data(as_text=True)
+
+
+def show_times():
+  return db.session.query(Show.start_time, Show.end_time).order_by(Show.start_time).all()
+
+
+def test_show_form_books_the_default_duration_only_for_an_empty_end_time(client):
+  venue_id, artist_id = add_show(datetime(2025, 1, 1, 20))
+  page = post_show(client, venue_id, artist_id, '2025-01-02 20:00:00')
+  assert 'Show was successfully listed!' in page
+  assert show_times()[-1] == (datetime(2025, 1, 2, 20), datetime(2025, 1, 2, 22))
+
+
+def test_show_form_rejects_bad_end_times(client):
+  venue_id, artist_id = add_show(datetime(2025, 1, 1, 20))
+  page = post_show(client, venue_id, artist_id, '2025-01-02 20:00:00', 'tomorrow')
+  assert 'End time must be empty or look like' in page
+  page = post_show(client, venue_id, artist_id, '2025-01-02 20:00:00', '2025-01-02 19:00:00')
+  assert 'The show must end after it starts.' in page
+  page = post_show(client, venue_id, artist_id, 'tonight')
+  assert 'Start time must look like' in page
+  assert len(show_times()) == 1
+
+
+def test_show_form_rejects_overlapping_bookings(client):
+  venue_id, artist_id = add_show(datetime(2025, 1, 1, 20), datetime(2025, 1, 1, 22))
+  page = post_show(client, venue_id, artist_id, '2025-01-01 21:00:00')
+  assert 'The venue already has a show at that time.' in page
+  # back to back is fine
+  page = post_show(client, venue_id, artist_id, '2025-01-01 22:00:00')
+  assert 'Show was successfully listed!' in page
+  assert len(show_times()) == 2
+
+
+def test_booking_conflicts_are_half_open_ranges(app):
+  venue_id, artist_id = add_show(datetime(2025, 1, 1, 20), datetime(2025, 1, 1, 22))
+  for start, end, count in ((21, 23, 1), (19, 21, 1), (20, 22, 1), (22, 23, 0), (18, 20, 0)):
+    conflicts = booking_conflicts(Show.venue_id, venue_id, datetime(2025, 1, 1, start),
+                                  datetime(2025, 1, 1, end))
+    assert len(conflicts) == count, (start, end)
+  assert booking_conflicts(Show.artist_id, artist_id + 1, datetime(2025, 1, 1, 21),
+                           datetime(2025, 1, 1, 23)) == []
+  rows = batch_bookings({venue_id + 1}, {artist_id}, datetime(2025, 1, 1),
+                        datetime(2025, 1, 2))
+  assert [(row.venue_id, row.artist_id) for row in rows] == [(venue_id, artist_id)]
+
+
+def test_sqlite_triggers_reject_overlapping_inserts_and_updates(app):
+  venue_id, artist_id = add_show(datetime(2025, 1, 1, 20), datetime(2025, 1, 1, 22))
+  other = Artist(name='Red Band', city='Austin', state='TX')
+  db.session.add(other)
+  db.session.commit()
+  # the venue is taken whoever plays
+  db.session.add(Show(venue_id=venue_id, artist_id=other.id,
+                      start_time=datetime(2025, 1, 1, 21)))
+  with pytest.raises(IntegrityError, match='ex_Show_venue_booking'):
+    db.session.commit()
+  db.session.rollback()
+
+  show = Show(venue_id=venue_id, artist_id=other.id, start_time=datetime(2025, 1, 1, 22))
+  db.session.add(show)
+  db.session.commit()
+  show.start_time = datetime(2025, 1, 1, 21, 30)
+  with pytest.raises(IntegrityError, match='ex_Show_venue_booking'):
+    db.session.commit()
+  db.session.rollback()
+  # a show may move within its own slot
+  show.end_time = datetime(2025, 1, 1, 23, 30)
+  db.session.commit()
+  assert len(show_times()) == 2
+
+
+def test_import_rejects_shows_overlapping_stored_shows_or_the_batch(app):
+  venue_id, artist_id = add_show(datetime(2025, 1, 1, 20), datetime(2025, 1, 1, 22))
+  rows = [{'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}
+          for start_time in ('2025-01-01 21:00:00', '2025-01-01 22:00:00',
+                             '2025-01-01 23:00:00', '2025-01-02 00:00:00')]
+  file = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+  rejects = io.StringIO()
+  with app.test_request_context():
+    assert import_rows('shows', file, 'ndjson', rejects) == (2, 2)
+  assert [json.loads(line)['line'] for line in rejects.getvalue().splitlines()] == [1, 3]
+  assert [start for start, end in show_times()] == [
+      datetime(2025, 1, 1, 20), datetime(2025, 1, 1, 22), datetime(2025, 1, 2)]
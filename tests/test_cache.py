@@ -0,0 +1,100 @@
+from datetime import datetime
+import pytest
+from cache import (LRUCache, area_key, cache, evict_artist, evict_show, evict_venue,
+                   page_key)
+from extensions import db
+from models.models import Artist, Show, Venue
+
+
+@pytest.fixture
+def lru(app):
+  # the testing profile caches nothing
+  cache.backend = LRUCache()
+  return cache.backend
+
+
+def add_venue(name='Blue Hall'):
+  venue = Venue(name=name, city='Austin', state='TX', genres=['Jazz'])
+  db.session.add(venue)
+  db.session.commit()
+  return venue.id
+
+
+def edit_venue(client, venue_id, name):
+  client.post('/venues/%d/edit' % venue_id, data={
+      'name': name, 'city': 'Austin', 'state': 'TX', 'genres': ['Jazz']})
+
+
+def page(client, url):
+  response = client.get(url)
+  assert response.status_code == 200, url
+  return response.get_data(as_text=True)
+
+
+def test_pages_are_keyed_on_the_query_args_the_view_reads(client, lru):
+  venue_id = add_venue()
+  page(client, '/venues/%d' % venue_id)
+  assert 'Blue Hall' in page(client, '/venues/%d?utm_source=mail' % venue_id)
+  assert lru.stats()['entries'] == 1
+
+  # the edit evicts the one entry every variant of the url reads
+  edit_venue(client, venue_id, 'Green Hall')
+  assert 'Green Hall' in page(client, '/venues/%d?utm_source=mail' % venue_id)
+
+  entries = lru.stats()['entries']
+  page(client, '/shows?when=upcoming&utm_source=mail')
+  page(client, '/shows?utm_source=mail&when=upcoming')
+  page(client, '/shows?when=past')
+  assert lru.stats()['entries'] == entries + 2
+
+
+def warm(client):
+  # two venues and two artists with one show each, every page of them cached
+  venues = [Venue(name=name, city=city, state='TX', genres=['Jazz']) for name, city in (
+      ('Blue Hall', 'Austin'), ('Red Hall', 'Dallas'))]
+  artists = [Artist(name=name, city='Austin', state='TX', genres=['Jazz'])
+             for name in ('Blue Band', 'Red Band')]
+  for venue, artist in zip(venues, artists):
+    db.session.add(Show(venue_shows=venue, artist_shows=artist,
+                        start_time=datetime(2030, 1, 1, 20)))
+  db.session.commit()
+  for url in ('/venues', '/venues/1', '/venues/2', '/artists', '/artists/1', '/artists/2',
+              '/shows'):
+    page(client, url)
+  return {'/venues', '/venues/1', '/venues/2', '/artists', '/artists/1', '/artists/2',
+          'areas', 'Austin', 'Dallas', '/shows'}
+
+
+def cached(version):
+  # which of the warmed entries are still served from the cache
+  keys = {url: page_key(url) for url in ('/venues', '/venues/1', '/venues/2', '/artists',
+                                         '/artists/1', '/artists/2')}
+  keys.update({'areas': 'areas', 'Austin': area_key('Austin', 'TX'),
+               'Dallas': area_key('Dallas', 'TX')})
+  entries = {name for name, key in keys.items() if cache.get(key) is not None}
+  if cache.version('shows') == version:
+    entries.add('/shows')
+  return entries
+
+
+def test_venue_writes_evict_its_pages_and_its_artists(client, lru):
+  everything = warm(client)
+  version = cache.version('shows')
+  evict_venue(1, [('Austin', 'TX')])
+  assert cached(version) == everything - {
+      '/venues', '/venues/1', 'areas', 'Austin', '/artists/1', '/shows'}
+
+
+def test_artist_writes_evict_its_pages_and_its_venues(client, lru):
+  everything = warm(client)
+  version = cache.version('shows')
+  evict_artist(2)
+  assert cached(version) == everything - {'/artists', '/artists/2', '/venues/2', '/shows'}
+
+
+def test_show_writes_evict_both_sides_and_the_area(client, lru):
+  everything = warm(client)
+  version = cache.version('shows')
+  evict_show(2, 1)
+  assert cached(version) == everything - {
+      '/venues', '/venues/2', '/artists/1', 'Dallas', '/shows'}
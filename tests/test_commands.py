@@ -0,0 +1,54 @@
+import pytest
+from app import create_app
+from dataset import generate
+from extensions import db
+from models.models import Venue
+from search import name_indexes
+
+
+@pytest.fixture
+def cli_app():
+  # the testing profile with the fyyur commands registered
+  app = create_app('testing')
+  with app.app_context():
+    db.create_all()
+    yield app
+    db.session.remove()
+    db.drop_all()
+  name_indexes.clear()
+
+
+def test_explain_checks_html_and_api_routes(cli_app):
+  generate(20, 20, 200)
+  result = cli_app.test_cli_runner().invoke(args=['fyyur', 'explain'])
+  assert result.exit_code == 0, result.output
+  for url in ('/api/v1/shows', '/api/v1/calendar?', '/api/v1/venues/1/availability?',
+              '/api/v1/artists/1/availability?'):
+    assert 'GET ' + url in result.output
+
+
+def test_explain_fails_when_show_loses_its_indexes(cli_app):
+  generate(20, 20, 200)
+  for index in db.Model.metadata.tables['Show'].indexes:
+    index.drop(db.engine)
+  result = cli_app.test_cli_runner().invoke(args=['fyyur', 'explain'])
+  assert result.exit_code == 1
+  assert 'GET /api/v1/venues/1/availability?' in result.output
+  assert 'statement(s) sequentially scan Show' in result.output
+
+
+def test_check_counters_reports_and_fixes_drift(cli_app):
+  generate(5, 5, 50)
+  runner = cli_app.test_cli_runner()
+  assert runner.invoke(args=['fyyur', 'check-counters']).exit_code == 0
+  venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+  Venue.query.filter_by(id=venue_id).update(
+      {Venue.upcoming_shows_count: Venue.upcoming_shows_count + 1})
+  db.session.commit()
+
+  result = runner.invoke(args=['fyyur', 'check-counters'])
+  assert result.exit_code == 1
+  assert 'Venue %d: upcoming_shows_count' % venue_id in result.output
+  assert '1 counter(s) out of date' in result.output
+  assert runner.invoke(args=['fyyur', 'check-counters', '--fix']).exit_code == 0
+  assert runner.invoke(args=['fyyur', 'check-counters']).exit_code == 0
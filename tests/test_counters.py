@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from counters import counter_mismatches, refresh_counters
+from extensions import db
+from models.models import Artist, Show, Venue
+from queries import show_page, split_shows
+
+NOW = datetime(2025, 6, 1, 20)
+
+
+def add_shows(*start_times):
+  venue = Venue(name='Blue Hall', city='Austin', state='TX')
+  artist = Artist(name='Blue Band', city='Austin', state='TX')
+  for start_time in start_times:
+    db.session.add(Show(venue_shows=venue, artist_shows=artist, start_time=start_time))
+  db.session.commit()
+  return venue
+
+
+def test_a_show_starting_now_is_upcoming_everywhere(app):
+  venue = add_shows(NOW - timedelta(days=1), NOW)
+  refresh_counters(Venue, now=NOW)
+  refresh_counters(Artist, now=NOW)
+  db.session.commit()
+  assert (venue.upcoming_shows_count, venue.next_show_at) == (1, NOW)
+  assert counter_mismatches(Venue, NOW) == [] and counter_mismatches(Artist, NOW) == []
+
+  past, upcoming = split_shows(venue.shows, NOW)
+  assert [show.start_time for show in upcoming] == [NOW]
+  assert [row.start_time for row in show_page('upcoming', now=NOW)[0]] == [NOW]
+  assert [row.start_time for row in show_page('past', now=NOW)[0]] == [NOW - timedelta(days=1)]
+
+  # its start doesn't make the counters stale yet, a second later it does
+  assert refresh_counters(Venue, stale_only=True, now=NOW) == 0
+  assert refresh_counters(Venue, stale_only=True, now=NOW + timedelta(seconds=1)) == 1
+
+
+def test_drifted_counters_are_found_and_refreshed(app):
+  venue = add_shows(NOW + timedelta(days=1), NOW + timedelta(days=2))
+  refresh_counters(Venue, now=NOW)
+  db.session.commit()
+  # a write that skipped the counters
+  db.session.query(Show).filter(Show.start_time == NOW + timedelta(days=1)).delete()
+  db.session.commit()
+  rows = counter_mismatches(Venue, NOW)
+  assert [(row.id, row.upcoming_shows_count, row.expected_count) for row in rows] == [
+      (venue.id, 2, 1)]
+  assert rows[0].expected_next_show_at == NOW + timedelta(days=2)
+
+  assert refresh_counters(Venue, [venue.id], now=NOW) == 1
+  db.session.commit()
+  assert counter_mismatches(Venue, NOW) == []
+  assert (venue.upcoming_shows_count, venue.next_show_at) == (1, NOW + timedelta(days=2))
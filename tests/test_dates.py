@@ -0,0 +1,20 @@
+from datetime import datetime
+import babel.dates
+from dates import format_datetime
+
+VALUE = datetime(2025, 1, 2, 20, 5)
+
+
+def test_babel_named_formats_are_resolved():
+  for format in ('short', 'long'):
+    for locale in ('en', 'de', 'fr'):
+      assert format_datetime(VALUE, format, locale) == babel.dates.format_datetime(
+          VALUE, format, locale=locale), (format, locale)
+  assert format_datetime(VALUE, 'short') == '1/2/25, 8:05 PM'
+
+
+def test_repo_formats_and_patterns():
+  assert format_datetime(VALUE) == 'Thu 01, 02, 2025 8:05PM'
+  assert format_datetime(VALUE, 'full') == 'Thursday January, 2, 2025 at 8:05PM'
+  assert format_datetime(VALUE, 'yyyy-MM-dd HH:mm') == '2025-01-02 20:05'
+  assert format_datetime('2025-01-02T20:05:00', 'yyyy-MM-dd HH:mm') == '2025-01-02 20:05'
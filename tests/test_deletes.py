@@ -0,0 +1,82 @@
+from datetime import datetime
+from counters import counter_mismatches, refresh_counters
+from extensions import db
+from models.models import Artist, Show, Venue
+
+
+def add_venues(*ids):
+  for id in ids:
+    db.session.add(Venue(id=id, name='Venue %d' % id, city='Austin', state='TX'))
+  db.session.commit()
+
+
+def venue_ids():
+  return sorted(id for id, in db.session.query(Venue.id))
+
+
+def test_bulk_delete_takes_a_json_list_of_ids(client):
+  add_venues(1, 3, 13)
+  response = client.post('/venues/delete', json={'ids': [13]})
+  assert response.status_code == 200
+  assert response.get_json()['deleted'] == [13]
+  assert venue_ids() == [1, 3]
+
+
+def test_bulk_delete_takes_repeated_form_fields(client):
+  add_venues(1, 3, 13)
+  response = client.post('/venues/delete', data={'ids': ['1', '13']})
+  assert response.status_code == 200
+  assert venue_ids() == [3]
+
+
+def test_bulk_delete_rejects_other_shapes(client):
+  # a string is not read as its characters, {"ids": "13"} must not delete 1 and 3
+  add_venues(1, 3, 13)
+  for body in ({'ids': '13'}, {'ids': 13}, {'ids': [True]}, {'ids': ['13']},
+               {'ids': [1.5]}, {'ids': None}, {}, [13]):
+    assert client.post('/venues/delete', json=body).status_code == 400, body
+  assert client.post('/artists/delete', json={'ids': '13'}).status_code == 400
+  assert client.post('/venues/delete', data={'ids': ['x']}).status_code == 400
+  assert venue_ids() == [1, 3, 13]
+
+
+
+def add_tour(venue_ids, artist_ids):
+  # every artist plays every venue once on a future night, counters up to date
+  add_venues(*venue_ids)
+  for artist_id in artist_ids:
+    db.session.add(Artist(id=artist_id, name='Artist %d' % artist_id, city='Austin',
+                          state='TX'))
+  night = 0
+  for venue_id in venue_ids:
+    for artist_id in artist_ids:
+      night += 1
+      db.session.add(Show(venue_id=venue_id, artist_id=artist_id,
+                          start_time=datetime(2030, 1, night, 20)))
+  db.session.flush()
+  refresh_counters(Venue)
+  refresh_counters(Artist)
+  db.session.commit()
+
+
+def upcoming_counts(model):
+  return dict(db.session.query(model.id, model.upcoming_shows_count))
+
+
+def test_deleting_venues_removes_their_shows_and_recounts_their_artists(client):
+  add_tour([1, 2, 3], [7, 8])
+  assert upcoming_counts(Artist) == {7: 3, 8: 3}
+  assert client.post('/venues/delete', json={'ids': [1, 3]}).status_code == 200
+  assert venue_ids() == [2]
+  assert sorted(db.session.query(Show.venue_id).distinct()) == [(2,)]
+  assert upcoming_counts(Artist) == {7: 1, 8: 1}
+  assert counter_mismatches(Artist) == []
+
+
+def test_deleting_artists_removes_their_shows_and_recounts_their_venues(client):
+  add_tour([1, 2], [7, 8, 9])
+  assert client.post('/artists/delete', json={'ids': [7, 9]}).status_code == 200
+  assert upcoming_counts(Artist) == {8: 2}
+  assert sorted(db.session.query(Show.artist_id).distinct()) == [(8,)]
+  assert upcoming_counts(Venue) == {1: 1, 2: 1}
+  assert counter_mismatches(Venue) == []
@@ -0,0 +1,54 @@
+import search as search_module
+from extensions import db
+from models.models import Venue
+from search import NameIndex, search
+
+
+def add_venues(*rows):
+  for name, genres in rows:
+    db.session.add(Venue(name=name, city='Austin', state='TX', genres=genres))
+  db.session.commit()
+
+
+def test_genre_filter_skips_venues_without_genres(client):
+  add_venues(('Blue Hall', ['Jazz']), ('Blue Room', None), ('Blue Bar', ['Rock n Roll']))
+  response = client.get('/api/v1/venues/search?q=blue&genre=Jazz')
+  assert response.status_code == 200
+  data = response.get_json()
+  assert [venue['name'] for venue in data['data']] == ['Blue Hall']
+  assert data['genres'] == [{'genre': 'Jazz', 'count': 1}, {'genre': 'Rock n Roll', 'count': 1}]
+
+
+def names(results):
+  return [result.name for result in results]
+
+
+def test_name_index_ranks_prefix_matches_first_and_follows_writes(app):
+  add_venues(('Hall of Blue', None), ('Blue Hall', None), ('The Blue Room', None),
+             ('Bluebird', None), ('Red Hall', None))
+  assert names(search(Venue, 'blue')) == ['Bluebird', 'Blue Hall', 'Hall of Blue', 'The Blue Room']
+  assert names(search(Venue, 'blue', 2)) == ['Bluebird', 'Blue Hall']
+  assert names(search(Venue, 'l')) == ['Bluebird', 'Red Hall', 'Blue Hall', 'Hall of Blue',
+                                       'The Blue Room']
+  assert names(search(Venue, 'zz')) == []
+
+  bluebird = Venue.query.filter_by(name='Bluebird').one()
+  bluebird.name = 'Greenbird'
+  db.session.delete(Venue.query.filter_by(name='Blue Hall').one())
+  db.session.commit()
+  assert names(search(Venue, 'blue')) == ['Hall of Blue', 'The Blue Room']
+  assert names(search(Venue, 'bird')) == ['Greenbird']
+
+
+def test_changes_committed_during_a_build_are_applied(app, monkeypatch):
+  add_venues(('Blue Hall', None))
+
+  class RacingIndex(NameIndex):
+    # another request renames the venue after the build has read the table
+    def __init__(self, rows):
+      super(RacingIndex, self).__init__(rows)
+      Venue.query.filter_by(name='Blue Hall').one().name = 'Green Hall'
+      db.session.commit()
+
+  monkeypatch.setattr(search_module, 'NameIndex', RacingIndex)
+  assert names(search(Venue, 'hall')) == ['Green Hall']
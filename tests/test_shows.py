@@ -0,0 +1,77 @@
+import base64
+from datetime import datetime, timedelta
+from extensions import db
+from models.models import Artist, Show, Venue
+from queries import encode_cursor
+
+
+def add_shows(*start_times):
+  venue = Venue(name='Blue Hall', city='Austin', state='TX', genres=['Jazz'])
+  artist = Artist(name='Blue Band', city='Austin', state='TX', genres=['Jazz'])
+  for start_time in start_times:
+    db.session.add(Show(venue_shows=venue, artist_shows=artist, start_time=start_time))
+  db.session.commit()
+
+
+def listed(client, url):
+  response = client.get(url)
+  assert response.status_code == 200, url
+  return [show['start_time'] for show in response.get_json()['data']]
+
+
+def test_window_values_with_an_offset_are_read_as_utc(client):
+  add_shows(datetime(2025, 1, 1, 10), datetime(2025, 1, 1, 14))
+  assert listed(client, '/api/v1/shows?start=2025-01-01T00:00:00%2B00:00'
+                        '&end=2025-01-02T00:00:00%2B00:00') == [
+      '2025-01-01T10:00:00', '2025-01-01T14:00:00']
+  # 13:00 at +02:00 is 11:00 utc, only one of the two values has an offset
+  assert listed(client, '/api/v1/shows?start=2025-01-01T13:00:00%2B02:00'
+                        '&end=2025-01-02') == ['2025-01-01T14:00:00']
+  assert client.get('/shows?start=2025-01-01T00:00:00%2B00:00&end=2025-01-02').status_code == 200
+  assert client.get('/api/v1/calendar?start=2025-01-01T00:00:00-05:00'
+                    '&end=2025-01-02').status_code == 200
+
+
+def test_bad_window_values_are_rejected(client):
+  add_shows(datetime(2025, 1, 1, 10))
+  for query in ('start=tomorrow', 'start=2025-01-02&end=2025-01-01',
+                'start=2025-01-01T05:00:00%2B00:00&end=2025-01-01T06:00:00%2B02:00'):
+    assert client.get('/api/v1/shows?' + query).status_code == 400, query
+    assert client.get('/shows?' + query).status_code == 400, query
+
+
+def pages(client, when):
+  # the show ids of every page of a feed, following next_cursor
+  pages = []
+  url = '/api/v1/shows?per_page=2&when=' + when
+  while url:
+    body = client.get(url).get_json()
+    pages.append([show['id'] for show in body['data']])
+    url = body['next_cursor'] and '/api/v1/shows?per_page=2&when=%s&cursor=%s' % (
+        when, body['next_cursor'])
+  return pages
+
+
+def test_cursor_pages_chain_without_gaps_or_duplicates(client):
+  # five shows, two of them at the same time in different venues so the id breaks
+  # the tie
+  now = datetime.utcnow().replace(microsecond=0)
+  times = [now - timedelta(days=2), now - timedelta(days=1), now + timedelta(days=1),
+           now + timedelta(days=2)]
+  add_shows(*times)
+  add_shows(times[1])
+  assert pages(client, 'all') == [[1, 2], [5, 3], [4]]
+  assert pages(client, 'upcoming') == [[3, 4]]
+  # past shows come most recent first
+  assert pages(client, 'past') == [[5, 2], [1]]
+  assert client.get('/shows?per_page=2&cursor=' + encode_cursor(times[1], 1)).status_code == 200
+
+
+def test_bad_cursors_are_rejected(client):
+  add_shows(datetime(2025, 1, 1, 10))
+  for cursor in ('nonsense', '!!!', base64.urlsafe_b64encode(b'2025-01-01').decode(),
+                 base64.urlsafe_b64encode(b'yesterday|1').decode(),
+                 base64.urlsafe_b64encode(b'2025-01-01|one').decode(),
+                 base64.urlsafe_b64encode(b'\xff\xfe').decode()):
+    assert client.get('/api/v1/shows?cursor=' + cursor).status_code == 400, cursor
+    assert client.get('/shows?cursor=' + cursor).status_code == 400, cursor
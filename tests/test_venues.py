@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from extensions import db
+from models.models import Artist, Show, Venue
+
+
+@contextmanager
+def count_queries():
+  statements = []
+
+  def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+  event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+  try:
+    yield statements
+  finally:
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def add_venues(areas, venues_per_area, shows_per_venue):
+  artist = Artist(name='Band %d' % Artist.query.count(), city='San Francisco', state='CA')
+  db.session.add(artist)
+  start = datetime.utcnow() + timedelta(days=1)
+  for city, state in areas:
+    for _ in range(venues_per_area):
+      venue = Venue(name='%s venue' % city, city=city, state=state, genres=['Jazz'])
+      db.session.add(venue)
+      for _ in range(shows_per_venue):
+        db.session.add(Show(venue_shows=venue, artist_shows=artist, start_time=start))
+        start += timedelta(hours=3)
+  db.session.commit()
+
+
+def test_venues_query_count_is_constant(client):
+  # the listing comes from a fixed number of queries, however many areas, venues
+  # and shows there are
+  add_venues([('San Francisco', 'CA')], 1, 1)
+  with count_queries() as few:
+    assert client.get('/venues').status_code == 200
+
+  add_venues([('New York', 'NY'), ('Boston', 'MA'), ('Springfield', 'IL'),
+              ('Springfield', 'MA')], 5, 3)
+  with count_queries() as many:
+    response = client.get('/venues')
+  assert response.status_code == 200
+  assert len(many) == len(few) == 2
+  page = response.get_data(as_text=True)
+  assert 'Springfield, IL' in page and 'Springfield, MA' in page
@@ -0,0 +1,65 @@
+import sqlite3
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import OperationalError
+import writes
+from extensions import db
+from models.models import Artist, Show, Venue
+from writes import WriteError, create_show, transactional, update_artist
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+  # the pauses between retries, without waiting for them
+  sleeps = []
+  monkeypatch.setattr(writes.time, 'sleep', sleeps.append)
+  return sleeps
+
+
+def locked_writer(failures):
+  # a write whose first failures attempts find the database locked
+  attempts = []
+
+  @transactional
+  def write():
+    attempts.append(len(attempts))
+    db.session.add(Venue(name='Venue %d' % len(attempts), city='Austin', state='TX'))
+    if len(attempts) <= failures:
+      raise OperationalError('INSERT', {}, sqlite3.OperationalError('database is locked'))
+    return len(attempts)
+  return write, attempts
+
+
+def test_locked_database_is_retried(app, sleeps):
+  write, attempts = locked_writer(2)
+  assert write() == 3
+  assert len(sleeps) == 2
+  # the failed attempts were rolled back
+  assert [name for name, in db.session.query(Venue.name)] == ['Venue 3']
+
+
+def test_retries_run_out_with_a_database_error(app, sleeps):
+  write, attempts = locked_writer(app.config['WRITE_RETRIES'] + 1)
+  with pytest.raises(WriteError) as error:
+    write()
+  assert error.value.code == 'database'
+  assert error.value.detail == 'database is locked'
+  assert len(attempts) == app.config['WRITE_RETRIES'] + 1
+  assert Venue.query.count() == 0
+
+
+def test_other_errors_are_not_retried(app, sleeps):
+  venue = Venue(name='Blue Hall', city='Austin', state='TX')
+  artist = Artist(name='Blue Band', city='Austin', state='TX')
+  db.session.add_all([venue, artist])
+  db.session.commit()
+  create_show(venue.id, artist.id, datetime(2025, 1, 1, 20), datetime(2025, 1, 1, 22))
+  with pytest.raises(WriteError) as error:
+    create_show(venue.id, artist.id, datetime(2025, 1, 1, 21), datetime(2025, 1, 1, 23))
+  assert error.value.code == 'conflict'
+  assert error.value.to_dict() == {'code': 'conflict',
+                                   'message': 'It conflicts with existing data.'}
+  with pytest.raises(WriteError) as error:
+    update_artist(artist.id + 1, {'name': 'Red Band'})
+  assert error.value.code == 'not_found'
+  assert sleeps == [] and Show.query.count() == 1
@@ -0,0 +1,423 @@
+# ----------------------------------------------------------------------------#
+# Imports
+# ----------------------------------------------------------------------------#
+from models.models import Artist, Show, Venue, SHOW_DURATION
+from search import search
+from queries import (SHOW_PAGE_ARGS, area_list, artist_detail, artist_listing, booking_conflicts, page_filters,
+                     show_page, show_page_args, venue_areas, venue_detail)
+from serializers import artist_data, artist_listing_item, search_response, show_item, venue_data
+from counters import upcoming_counters
+from writes import (WriteError, create_artist, create_show, create_venue, delete_artists, delete_venues,
+                    update_artist, update_venue)
+from cache import area_key, cache, cached_page, evict_artist, evict_show, evict_venue
+from profiling import profiler
+from replicas import read_only
+from dates import format_datetime
+# the form views import forms themselves, so serving the read pages never loads wtforms
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, jsonify, abort
+from markupsafe import Markup
+
+main = Blueprint('main', __name__)
+
+
+# ----------------------------------------------------------------------------#
+# Filters.
+# ----------------------------------------------------------------------------#
+
+
+main.add_app_template_filter(format_datetime, 'datetime')
+
+
+# ----------------------------------------------------------------------------#
+# Helpers.
+# ----------------------------------------------------------------------------#
+
+
+def requested_ids():
+  # ids for bulk endpoints, from a json body {"ids": [...]} of integers or repeated ids
+  # form fields. any other shape is a 400, a string of digits is not a list of ids
+  body = request.get_json(silent=True)
+  if body is not None:
+    ids = body.get('ids') if isinstance(body, dict) else None
+    if not isinstance(ids, list) or not all(
+        isinstance(id, int) and not isinstance(id, bool) for id in ids):
+      abort(400)
+    return ids
+  try:
+    return [int(id) for id in request.form.getlist('ids')]
+  except ValueError:
+    abort(400)
+
+
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
+
+
+@main.route('/')
+def index():
+  return render_template('pages/home.html')
+
+
+@main.route('/venues')
+@read_only
+@cached_page()
+def venues():
+  # every area is rendered as a cached fragment, only the areas missing from the cache
+  # are queried (in one query) and rendered
+  areas = cache.get('areas')
+  if areas is None:
+    areas = [tuple(area) for area in area_list()]
+    cache.set('areas', areas)
+  keys = [area_key(city, state) for city, state in areas]
+  blocks = dict(zip(keys, cache.get_many(keys)))
+  missing = [area for area, key in zip(areas, keys) if blocks[key] is None]
+  if missing:
+    rendered = dict()
+    for area in venue_areas(missing):
+      rendered[area_key(area['city'], area['state'])] = render_template(
+          'fragments/venue_area.html', area=area)
+    cache.set_many(rendered)
+    blocks.update(rendered)
+  data = [Markup(blocks[key]) for key in keys if blocks[key] is not None]
+  return render_template('pages/venues.html', areas=data)
+
+
+@main.route('/venues/search', methods=['POST'])
+@read_only
+def search_venues():
+  # ranked, limited name search through the search index
+  search_term = request.form.get('search_term', '')
+  results = search(Venue, search_term, current_app.config['SEARCH_RESULTS_LIMIT'])
+  # read the upcoming show counters for all results in one query
+  counts = upcoming_counters(Venue, [result.id for result in results])
+  response = search_response(results, counts)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@main.route('/venues/<int:venue_id>')
+@read_only
+@cached_page()
+def show_venue(venue_id):
+  # load the venue with its shows and their artists in one query
+  venue = venue_detail(venue_id)
+  if venue is None:
+    abort(404)
+  data = venue_data(venue)
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@main.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+
+@main.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # create the venue from the form in one transaction
+  from forms import VenueForm
+  data = VenueForm().data
+  try:
+    venue_id = create_venue(data)
+  except WriteError as e:
+    flash('An error occurred. Venue %s could not be listed. %s' % (data['name'], e.message))
+  else:
+    evict_venue(venue_id, [(data['city'], data['state'])], artist_ids=[])
+    flash('Venue ' + data['name'] + ' was successfully listed!')
+
+  return render_template('pages/home.html')
+
+
+@main.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # delete the venue and its shows with set-based deletes in one transaction
+  try:
+    deleted, areas, artist_ids = delete_venues([venue_id])
+  except WriteError as e:
+    flash('An error occurred. Venue could not be deleted.')
+    return jsonify({'success': False, 'error': e.to_dict()}), 500
+  if not deleted:
+    abort(404)
+  evict_venue(venue_id, areas.values(), artist_ids)
+  flash('Venue was successfully deleted!')
+  return jsonify({'success': True})
+
+
+@main.route('/venues/delete', methods=['POST'])
+def bulk_delete_venues():
+  # delete many venues in one transaction, ids come as a json list or repeated form fields
+  ids = requested_ids()
+  try:
+    deleted, areas, artist_ids = delete_venues(ids)
+  except WriteError as e:
+    return jsonify({'success': False, 'error': e.to_dict()}), 500
+  for venue_id in deleted:
+    evict_venue(venue_id, [areas[venue_id]], artist_ids)
+  return jsonify({'success': True, 'deleted': deleted})
+
+#  Artists
+#  ----------------------------------------------------------------
+
+
+@main.route('/artists')
+@read_only
+@cached_page()
+def artists():
+  data = [artist_listing_item(artist) for artist in artist_listing()]
+
+  return render_template('pages/artists.html', artists=data)
+
+
+@main.route('/artists/search', methods=['POST'])
+@read_only
+def search_artists():
+  # ranked, limited name search through the search index
+  search_term = request.form.get('search_term', '')
+  results = search(Artist, search_term, current_app.config['SEARCH_RESULTS_LIMIT'])
+  # read the upcoming show counters for all results in one query
+  counts = upcoming_counters(Artist, [result.id for result in results])
+  response = search_response(results, counts)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+
+@main.route('/artists/<int:artist_id>')
+@read_only
+@cached_page()
+def show_artist(artist_id):
+  # load the artist with its shows and their venues in one query
+  artist = artist_detail(artist_id)
+  if artist is None:
+    abort(404)
+  data = artist_data(artist)
+  return render_template('pages/show_artist.html', artist=data)
+
+
+@main.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  # delete the artist and its shows with set-based deletes in one transaction
+  try:
+    deleted, venue_ids = delete_artists([artist_id])
+  except WriteError as e:
+    flash('An error occurred. Artist could not be deleted.')
+    return jsonify({'success': False, 'error': e.to_dict()}), 500
+  if not deleted:
+    abort(404)
+  evict_artist(artist_id, venue_ids)
+  flash('Artist was successfully deleted!')
+  return jsonify({'success': True})
+
+
+@main.route('/artists/delete', methods=['POST'])
+def bulk_delete_artists():
+  # delete many artists in one transaction, ids come as a json list or repeated form fields
+  ids = requested_ids()
+  try:
+    deleted, venue_ids = delete_artists(ids)
+  except WriteError as e:
+    return jsonify({'success': False, 'error': e.to_dict()}), 500
+  for artist_id in deleted:
+    evict_artist(artist_id, venue_ids)
+  return jsonify({'success': True, 'deleted': deleted})
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  artist = Artist.query.get(artist_id)
+  if artist is None:
+    abort(404)
+  form = ArtistForm(obj=artist)
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # update the artist with one UPDATE, without loading it
+  from forms import ArtistForm
+  data = ArtistForm().data
+  try:
+    update_artist(artist_id, data)
+  except WriteError as e:
+    if e.code == 'not_found':
+      abort(404)
+    flash('An error occurred. Artist %s could not be updated. %s' % (data['name'], e.message))
+  else:
+    evict_artist(artist_id)
+    flash('Artist ' + data['name'] + ' was successfully updated!')
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    abort(404)
+  form = VenueForm(obj=venue)
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # update the venue with one UPDATE, without loading it
+  from forms import VenueForm
+  data = VenueForm().data
+  try:
+    old_area = update_venue(venue_id, data)
+  except WriteError as e:
+    if e.code == 'not_found':
+      abort(404)
+    flash('An error occurred. Venue %s could not be updated. %s' % (data['name'], e.message))
+  else:
+    evict_venue(venue_id, [old_area, (data['city'], data['state'])])
+    flash('Venue ' + data['name'] + ' was successfully updated!')
+  return redirect(url_for('.show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@main.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+
+@main.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # create the artist from the form in one transaction
+  from forms import ArtistForm
+  data = ArtistForm().data
+  try:
+    artist_id = create_artist(data)
+  except WriteError as e:
+    flash('An error occurred. Artist %s could not be listed. %s' % (data['name'], e.message))
+  else:
+    evict_artist(artist_id, venue_ids=[])
+    flash('Artist ' + data['name'] + ' was successfully listed!')
+
+  return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@main.route('/shows')
+@read_only
+@cached_page('shows', SHOW_PAGE_ARGS)
+def shows():
+  # page through shows with an opaque (start_time, id) cursor, optionally limited to
+  # upcoming or past shows and to a start/end window, city, state or genre
+  try:
+    when, cursor, per_page, window = show_page_args(request.args, current_app.config)
+    rows, next_cursor = show_page(when, cursor, per_page, window=window)
+  except ValueError:
+    abort(400)
+  data = [show_item(row) for row in rows]
+
+  return render_template('pages/shows.html', shows=data, when=when, next_cursor=next_cursor,
+                         filters=page_filters(request.args))
+
+
+@main.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+
+def booking_error(form):
+  # why the show in the form can't be booked, or None. an end time that doesn't parse
+  # is an error, only an empty one means the default duration. the exclusion
+  # constraints still reject a conflicting show booked in between
+  if not form.validate():
+    if form.start_time.errors:
+      return 'Start time must look like YYYY-MM-DD HH:MM:SS.'
+    if form.end_time.errors:
+      return 'End time must be empty or look like YYYY-MM-DD HH:MM:SS.'
+    return 'The form expired, please submit it again.'
+  data = form.data
+  try:
+    venue_id = int(data['venue_id'])
+    artist_id = int(data['artist_id'])
+  except (TypeError, ValueError):
+    return 'Venue and artist IDs must be numbers.'
+  start_time = data['start_time']
+  end_time = data['end_time'] or start_time + SHOW_DURATION
+  if end_time <= start_time:
+    return 'The show must end after it starts.'
+  if Venue.query.get(venue_id) is None:
+    return 'There is no venue %d.' % venue_id
+  if Artist.query.get(artist_id) is None:
+    return 'There is no artist %d.' % artist_id
+  if booking_conflicts(Show.venue_id, venue_id, start_time, end_time):
+    return 'The venue already has a show at that time.'
+  if booking_conflicts(Show.artist_id, artist_id, start_time, end_time):
+    return 'The artist already has a show at that time.'
+  return None
+
+
+@main.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # check the booking, then create the show and refresh its counters in one transaction
+  from forms import ShowForm
+  form = ShowForm()
+  problem = booking_error(form)
+  if problem is not None:
+    flash(problem + ' Show could not be listed.')
+    return render_template('forms/new_show.html', form=form)
+  data = form.data
+  venue_id = int(data['venue_id'])
+  artist_id = int(data['artist_id'])
+  try:
+    create_show(venue_id, artist_id, data['start_time'],
+                data['end_time'] or data['start_time'] + SHOW_DURATION)
+  except WriteError as e:
+    if e.code == 'conflict':
+      # booked by someone else since the check
+      flash('The venue or the artist already has a show at that time. Show could not be listed.')
+    else:
+      flash('An error occurred. Show could not be listed. ' + e.message)
+    return render_template('forms/new_show.html', form=form)
+  evict_show(venue_id, artist_id)
+  flash('Show was successfully listed!')
+
+  return render_template('pages/home.html')
+
+
+@main.route('/_cache')
+def cache_stats():
+  # hit/miss/eviction counters of this process's cache, for tuning CACHE_MAX_ENTRIES
+  if not current_app.debug:
+    abort(404)
+  return jsonify(cache.stats())
+
+
+@main.route('/_profile')
+def profile_stats():
+  # per endpoint timings and query counts of this process's recent requests
+  if not current_app.debug:
+    abort(404)
+  return jsonify(profiler.endpoint_stats())
+
+
+@main.app_errorhandler(404)
+def not_found_error(error):
+  return render_template('errors/404.html'), 404
+
+
+@main.app_errorhandler(500)
+def server_error(error):
+  return render_template('errors/500.html'), 500
+
@@ -0,0 +1,193 @@
+import itertools
+import random
+import time
+from functools import wraps
+from flask import current_app
+from sqlalchemy import distinct, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from counters import refresh_counters, refresh_show_counters
+from extensions import db
+from models.models import Artist, Show, Venue
+from search import record_name_deletes, record_name_update
+
+
+# ----------------------------------------------------------------------------#
+# Transactions.
+# ----------------------------------------------------------------------------#
+
+# every write runs in one transaction through @transactional: the function runs, then
+# the commit. serialization failures and deadlocks roll back and run it again, up to
+# WRITE_RETRIES times with a growing, jittered pause, so the function must only write
+# through the session. other database errors roll back and raise WriteError. the
+# session stays open for the rest of the request and is removed at its end
+
+# serialization_failure and deadlock_detected
+RETRY_SQLSTATES = ('40001', '40P01')
+
+
+class WriteError(Exception):
+  # code is 'not_found', 'conflict' (a constraint rejected the write) or 'database',
+  # message can be shown to users and detail is the database's own message
+
+  def __init__(self, code, message, detail=None):
+    super(WriteError, self).__init__(message)
+    self.code = code
+    self.message = message
+    self.detail = detail
+
+  def to_dict(self):
+    return {'code': self.code, 'message': self.message}
+
+
+def retryable(error):
+  # sqlite reports a concurrent writer as a locked database
+  return (getattr(error.orig, 'pgcode', None) in RETRY_SQLSTATES or
+          'database is locked' in str(error.orig))
+
+
+def transactional(write):
+  @wraps(write)
+  def wrapper(*args, **kwargs):
+    retries = current_app.config['WRITE_RETRIES']
+    for attempt in itertools.count():
+      try:
+        result = write(*args, **kwargs)
+        db.session.commit()
+        return result
+      except DBAPIError as e:
+        db.session.rollback()
+        if attempt < retries and retryable(e):
+          time.sleep(0.01 * 2 ** attempt * (1 + random.random()))
+          continue
+        current_app.logger.warning('%s failed: %s', write.__name__, e.orig)
+        if isinstance(e, IntegrityError):
+          raise WriteError('conflict', 'It conflicts with existing data.', str(e.orig))
+        raise WriteError('database', 'The database could not save it.', str(e.orig))
+      except BaseException:
+        db.session.rollback()
+        raise
+  return wrapper
+
+
+# form fields whose model column has a different name
+COLUMNS = {'seeking_venue': 'seeking_venues'}
+
+
+def columns(model, data):
+  # the form data for model's columns, under the column names
+  names = {column.name for column in model.__table__.columns} - {'id'}
+  values = dict()
+  for name, value in data.items():
+    name = COLUMNS.get(name, name)
+    if name in names:
+      values[name] = value
+  return values
+
+
+# ----------------------------------------------------------------------------#
+# Creates and updates.
+# ----------------------------------------------------------------------------#
+
+# a create is one INSERT and an update one UPDATE, then the commit: the new id is read
+# after the flush, before the commit expires the object, and updates never load the
+# row. the update of a venue returns its previous area, for cache eviction, from the
+# same statement where the database supports UPDATE ... RETURNING
+
+
+@transactional
+def create_venue(data):
+  venue = Venue(**columns(Venue, data))
+  db.session.add(venue)
+  db.session.flush()
+  return venue.id
+
+
+@transactional
+def create_artist(data):
+  artist = Artist(**columns(Artist, data))
+  db.session.add(artist)
+  db.session.flush()
+  return artist.id
+
+
+@transactional
+def create_show(venue_id, artist_id, start_time, end_time):
+  show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time,
+              end_time=end_time)
+  db.session.add(show)
+  refresh_show_counters([venue_id], [artist_id])
+  return show.id
+
+
+@transactional
+def update_venue(venue_id, data):
+  # returns the (city, state) the venue was listed under before the update
+  values = columns(Venue, data)
+  table = Venue.__table__
+  if db.engine.dialect.full_returning:
+    old = table.alias('old')
+    area = db.session.execute(table.update().where(table.c.id == venue_id).where(
+        old.c.id == table.c.id).values(**values).returning(old.c.city, old.c.state)).first()
+  else:
+    area = db.session.execute(select(table.c.city, table.c.state).where(
+        table.c.id == venue_id)).first()
+    if area is not None:
+      db.session.execute(table.update().where(table.c.id == venue_id).values(**values))
+  if area is None:
+    raise WriteError('not_found', 'There is no venue %d.' % venue_id)
+  record_name_update(db.session, Venue, venue_id, values['name'])
+  return tuple(area)
+
+
+@transactional
+def update_artist(artist_id, data):
+  values = columns(Artist, data)
+  table = Artist.__table__
+  result = db.session.execute(table.update().where(table.c.id == artist_id).values(**values))
+  if result.rowcount == 0:
+    raise WriteError('not_found', 'There is no artist %d.' % artist_id)
+  record_name_update(db.session, Artist, artist_id, values['name'])
+
+
+# ----------------------------------------------------------------------------#
+# Deletes.
+# ----------------------------------------------------------------------------#
+
+# deletes are set-based DELETE ... WHERE id IN (...) statements, so removing a venue
+# or artist never loads its shows. Show's foreign keys also cascade in the database
+
+
+@transactional
+def delete_venues(ids):
+  # returns the deleted ids, the (city, state) areas they were listed under and the
+  # artists that lost shows, for cache eviction
+  ids = list(ids)
+  rows = db.session.query(Venue.id, Venue.city, Venue.state).filter(
+      Venue.id.in_(ids)).all()
+  artist_ids = [artist_id for artist_id, in db.session.query(
+      distinct(Show.artist_id)).filter(Show.venue_id.in_(ids))]
+  db.session.query(Show).filter(Show.venue_id.in_(ids)).delete(
+      synchronize_session=False)
+  db.session.query(Venue).filter(Venue.id.in_(ids)).delete(
+      synchronize_session=False)
+  refresh_counters(Artist, artist_ids)
+  deleted = [row.id for row in rows]
+  record_name_deletes(db.session, Venue, deleted)
+  return deleted, {row.id: (row.city, row.state) for row in rows}, artist_ids
+
+
+@transactional
+def delete_artists(ids):
+  # returns the deleted ids and the venues that lost shows, for cache eviction
+  ids = list(ids)
+  deleted = [artist_id for artist_id, in db.session.query(Artist.id).filter(
+      Artist.id.in_(ids))]
+  venue_ids = [venue_id for venue_id, in db.session.query(
+      distinct(Show.venue_id)).filter(Show.artist_id.in_(ids))]
+  db.session.query(Show).filter(Show.artist_id.in_(ids)).delete(
+      synchronize_session=False)
+  db.session.query(Artist).filter(Artist.id.in_(ids)).delete(
+      synchronize_session=False)
+  refresh_counters(Venue, venue_ids)
+  record_name_deletes(db.session, Artist, deleted)
+  return deleted, venue_ids
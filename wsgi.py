@@ -0,0 +1,46 @@
+import os
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+from app import create_app
+from extensions import db
+from schema import check_schema
+from search import build_name_indexes
+from templating import warm_up
+
+
+# ----------------------------------------------------------------------------#
+# Forked workers.
+# ----------------------------------------------------------------------------#
+
+# gunicorn and uwsgi load the app once and fork the workers from it. a connection
+# opened before the fork would be shared by every worker, so each connection remembers
+# the process that opened it and is replaced when another process checks it out
+
+
+@event.listens_for(Pool, 'connect')
+def remember_pid(dbapi_connection, connection_record):
+  connection_record.info['pid'] = os.getpid()
+
+
+@event.listens_for(Pool, 'checkout')
+def check_pid(dbapi_connection, connection_record, connection_proxy):
+  # dropped without closing it, closing would also end the parent's session
+  pid = os.getpid()
+  if connection_record.info['pid'] != pid:
+    connection_record.connection = connection_proxy.connection = None
+    raise exc.DisconnectionError(
+        'connection opened by pid %s, checked out by pid %s' % (
+            connection_record.info['pid'], pid))
+
+
+# servers run the production profile unless FYYUR_ENV names another one
+app = create_app(os.environ.get('FYYUR_ENV', 'production'), cli=False)
+check_schema(app)
+warm_up(app)
+build_name_indexes(app)
+
+
+def dispose_pool():
+  # close the connections of this process's pool, before forking workers from it
+  with app.app_context():
+    db.engine.dispose()